@@ -0,0 +1,681 @@
+"""Latency, throughput and SQL query counts of the API routes
+
+Builds the app with create_app against a seeded database, SQLite in a
+temporary directory unless --database names another one, whose tables are
+then dropped and recreated, which --recreate must confirm. Every route of the auth, amenities, booking, reviews
+and search namespaces is sent --requests times through the test client and
+the results are compared with the stored baseline of the database. Latencies
+depend on the machine, a baseline is only meaningful where it was recorded:
+
+    python -m bench.endpoints                  # compare with the baseline
+    python -m bench.endpoints --save           # record a new baseline
+    python -m bench.endpoints --route search   # only routes containing "search"
+    python -m bench.endpoints --database postgresql://localhost/bench --recreate
+
+Exits with status 1 when a route answers with an unexpected status, when its
+p50 or p90 latency exceeds the baseline by more than --threshold (and by more
+than --min-delta ms), or when it runs more SQL queries per request than in
+the baseline.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Settings config.py requires when it is imported
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", "False")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("ECHO", "False")
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from endpoints.qr_code_util import generate_qr_code
+from exts import db
+from main import create_app
+from models import Amenity, Booking, Category, Review, User, search_index
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+PASSWORD = "bench-password"
+CATEGORIES = ["pool", "hall", "stadium", "court", "studio", "garden", "gym", "roof"]
+CITIES = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika"]
+WORDS = ["heated", "indoor", "floodlit", "quiet", "large", "modern", "shaded"]
+
+# Stored with the results, compare only reads the routes
+LATENCY_NOTE = (
+    "Latencies were measured on the machine that recorded this baseline and are "
+    "only comparable with runs on the same machine. Rerun with --save elsewhere."
+)
+
+# Bookings made by the benchmark start here, after the seeded ones
+FUTURE = datetime(2030, 1, 1)
+
+
+def seed(options):
+    """Fill the database with deterministic data, returning what routes use"""
+    rng = random.Random(options.seed)
+    password = generate_password_hash(
+        PASSWORD, method=current_app.config["PASSWORD_HASH_METHOD"]
+    )
+
+    def insert(model, rows):
+        for start in range(0, len(rows), 1000):
+            db.session.execute(db.insert(model), rows[start : start + 1000])
+
+    insert(
+        User,
+        [
+            {
+                "firstname": "Bench",
+                "lastname": f"User {i}",
+                "username": f"bench{i}",
+                "email": f"bench{i}@example.com",
+                "password": password,
+                "is_owner": i == 0,
+            }
+            for i in range(options.users)
+        ],
+    )
+    user_ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+    insert(Category, [{"name": name} for name in CATEGORIES])
+    category_ids = db.session.scalars(db.select(Category.id)).all()
+
+    insert(
+        Amenity,
+        [
+            {
+                "name": f"{rng.choice(WORDS).title()} {CATEGORIES[i % 8]} {i}",
+                "description": " ".join(rng.sample(WORDS, 3)) + f" {CATEGORIES[i % 8]}",
+                "price_per_hour": rng.randrange(5, 200),
+                "address": f"{i} Main Road, {rng.choice(CITIES)}",
+                "category_id": category_ids[i % len(category_ids)],
+                "owner_id": user_ids[0],
+            }
+            for i in range(options.amenities)
+        ],
+    )
+    amenities = db.session.execute(
+        db.select(Amenity.id, Amenity.name).order_by(Amenity.id)
+    ).all()
+
+    start = datetime(2026, 1, 5, 8)
+    bookings = []
+    for i in range(options.bookings):
+        amenity = amenities[i % len(amenities)]
+        begins = start + timedelta(hours=2 * (i // len(amenities)))
+        ends = begins + timedelta(hours=1)
+        payload = json.dumps(
+            {
+                "Amenity": amenity.name,
+                "Start": begins.isoformat(),
+                "End": ends.isoformat(),
+            }
+        )
+        bookings.append(
+            {
+                "user_id": user_ids[1 + i % (len(user_ids) - 1)],
+                "amenity_id": amenity.id,
+                "start_time": begins,
+                "end_time": ends,
+                "status": "booked",
+                "qr_code": generate_qr_code(payload),
+                "expires_at": begins + timedelta(hours=1),
+            }
+        )
+    insert(Booking, bookings)
+
+    pairs = set()
+    while len(pairs) < min(options.reviews, len(user_ids) * len(amenities) // 2):
+        pairs.add((rng.choice(user_ids[1:]), rng.choice(amenities).id))
+    insert(
+        Review,
+        [
+            {
+                "user_id": user_id,
+                "amenity_id": amenity_id,
+                "rating": rng.randint(1, 5),
+                "comment": "Bench review",
+            }
+            for user_id, amenity_id in sorted(pairs)
+        ],
+    )
+    db.session.commit()
+
+    search_index.rebuild()
+    Amenity.rebuild_ratings()
+
+    return {
+        "owner_id": user_ids[0],
+        "user_ids": user_ids[1:],
+        "category_ids": category_ids,
+        "amenity_ids": [amenity.id for amenity in amenities],
+        "reviewed_ids": sorted({amenity_id for _, amenity_id in pairs}),
+        "booker_id": bookings[0]["user_id"],
+        "qr_keys": [booking["qr_code"] for booking in bookings],
+        "booking_date": start.strftime("%Y-%m-%d"),
+    }
+
+
+class Bench:
+    """Seeded app and the helpers routes use to build their requests"""
+
+    def __init__(self, app, data):
+        self.app = app
+        self.data = data
+        self._tokens = {}
+
+    def token(self, user_id, refresh=False, fresh=False):
+        """Access or refresh token of a user, a new one when `fresh`"""
+        key = (user_id, refresh)
+        if fresh or key not in self._tokens:
+            create = create_refresh_token if refresh else create_access_token
+            token = create(identity=user_id, expires_delta=timedelta(hours=1))
+            if fresh:
+                return token
+            self._tokens[key] = token
+        return self._tokens[key]
+
+    def request(self, method, path, user=None, refresh=False, token=None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if user is not None:
+            token = self.token(user, refresh=refresh)
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        return {"method": method, "path": path, "headers": headers, **kwargs}
+
+    def pick(self, name, i):
+        values = self.data[name]
+        return values[i % len(values)]
+
+    def insert(self, model, **values):
+        """Insert a row outside of the timed request, returning its id"""
+        row = model(**values)
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+    def new_user(self, i, prefix):
+        return self.insert(
+            User,
+            firstname="Bench",
+            lastname=prefix,
+            username=f"{prefix}{i}",
+            email=f"{prefix}{i}@example.com",
+            password="unused",
+        )
+
+    def new_booking(self, i, prefix_hours):
+        begins = FUTURE + timedelta(hours=prefix_hours + 4 * i)
+        return self.insert(
+            Booking,
+            user_id=self.data["booker_id"],
+            amenity_id=self.pick("amenity_ids", i),
+            start_time=begins,
+            end_time=begins + timedelta(hours=1),
+            status="booked",
+            qr_code=f"bench{prefix_hours}-{i}",
+        )
+
+
+# Routes by name: the function building the request of iteration i, and the
+# status a successful request answers with
+ROUTES = {}
+
+
+def route(name, status=200):
+    def decorator(func):
+        ROUTES[name] = (func, status)
+        return func
+
+    return decorator
+
+
+@route("POST /api/auth/signup", 201)
+def signup(bench, i):
+    return bench.request(
+        "POST",
+        "/api/auth/signup",
+        json={
+            "firstname": "New",
+            "lastname": "User",
+            "username": f"signup{i}",
+            "email": f"signup{i}@example.com",
+            "password": PASSWORD,
+            "password_confirmation": PASSWORD,
+        },
+    )
+
+
+@route("POST /api/auth/login", 201)
+def login(bench, i):
+    return bench.request(
+        "POST", "/api/auth/login", json={"username": "bench0", "password": PASSWORD}
+    )
+
+
+@route("POST /api/auth/refresh")
+def refresh(bench, i):
+    return bench.request(
+        "POST", "/api/auth/refresh", user=bench.data["owner_id"], refresh=True
+    )
+
+
+@route("POST /api/auth/logout", 201)
+def logout(bench, i):
+    token = bench.token(bench.data["owner_id"], fresh=True)
+    return bench.request("POST", "/api/auth/logout", token=token)
+
+
+@route("GET /api/auth/user")
+def profile(bench, i):
+    return bench.request("GET", "/api/auth/user", user=bench.data["owner_id"])
+
+
+@route("PUT /api/auth/user")
+def update_profile(bench, i):
+    return bench.request(
+        "PUT",
+        "/api/auth/user",
+        user=bench.data["owner_id"],
+        data={"firstname": f"Bench {i}"},
+    )
+
+
+@route("DELETE /api/auth/user")
+def delete_profile(bench, i):
+    token = bench.token(bench.new_user(i, "deleted"), fresh=True)
+    return bench.request("DELETE", "/api/auth/user", token=token)
+
+
+@route("GET /api/amenities")
+def list_amenities(bench, i):
+    return bench.request("GET", "/api/amenities")
+
+
+@route("GET /api/amenities?stream=json")
+def stream_amenities(bench, i):
+    return bench.request("GET", "/api/amenities?stream=json")
+
+
+@route("GET /api/amenities/<id>")
+def get_amenity(bench, i):
+    return bench.request("GET", f"/api/amenities/{bench.pick('amenity_ids', i)}")
+
+
+@route("POST /api/amenities", 201)
+def create_amenity(bench, i):
+    return bench.request(
+        "POST",
+        "/api/amenities",
+        user=bench.data["owner_id"],
+        data={
+            "name": f"New amenity {i}",
+            "description": "Created by the benchmark",
+            "price_per_hour": "20",
+            "address": "1 Bench Road, Nairobi",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        },
+    )
+
+
+@route("PUT /api/amenities/<id>")
+def update_amenity(bench, i):
+    return bench.request(
+        "PUT",
+        f"/api/amenities/{bench.pick('amenity_ids', i)}",
+        user=bench.data["owner_id"],
+        data={"description": f"Updated by the benchmark {i}"},
+    )
+
+
+@route("DELETE /api/amenities/<id>")
+def delete_amenity(bench, i):
+    amenity_id = bench.insert(
+        Amenity,
+        name=f"Deleted amenity {i}",
+        description="Deleted by the benchmark",
+        price_per_hour=10,
+        address="1 Bench Road, Nairobi",
+        category_id=bench.data["category_ids"][0],
+        owner_id=bench.data["owner_id"],
+    )
+    return bench.request(
+        "DELETE", f"/api/amenities/{amenity_id}", user=bench.data["owner_id"]
+    )
+
+
+@route("GET /api/amenities/categories")
+def list_categories(bench, i):
+    return bench.request("GET", "/api/amenities/categories")
+
+
+@route("POST /api/amenities/categories")
+def create_category(bench, i):
+    return bench.request(
+        "POST", "/api/amenities/categories", json={"name": f"category {i}"}
+    )
+
+
+@route("GET /api/booking")
+def list_bookings(bench, i):
+    return bench.request("GET", "/api/booking", user=bench.data["booker_id"])
+
+
+@route("POST /api/booking", 201)
+def create_booking(bench, i):
+    begins = FUTURE + timedelta(hours=4 * i)
+    return bench.request(
+        "POST",
+        "/api/booking",
+        user=bench.data["booker_id"],
+        json={
+            "amenity_id": bench.pick("amenity_ids", i),
+            "start_date": begins.isoformat(),
+            "end_date": (begins + timedelta(hours=1)).isoformat(),
+        },
+    )
+
+
+@route("PUT /api/booking/<id>")
+def update_booking(bench, i):
+    booking_id = bench.new_booking(i, prefix_hours=1)
+    begins = FUTURE + timedelta(hours=2 + 4 * i)
+    return bench.request(
+        "PUT",
+        f"/api/booking/{booking_id}",
+        user=bench.data["booker_id"],
+        json={
+            "start_date": begins.isoformat(),
+            "end_date": (begins + timedelta(hours=1)).isoformat(),
+        },
+    )
+
+
+@route("DELETE /api/booking/<id>")
+def delete_booking(bench, i):
+    booking_id = bench.new_booking(i, prefix_hours=3)
+    return bench.request(
+        "DELETE", f"/api/booking/{booking_id}", user=bench.data["booker_id"]
+    )
+
+
+@route("GET /api/booking/qr/<key>")
+def booking_qr_code(bench, i):
+    return bench.request("GET", f"/api/booking/qr/{bench.pick('qr_keys', i)}.svg")
+
+
+@route("POST /api/reviews", 201)
+def create_review(bench, i):
+    # A new reviewer every time the amenities run out
+    amenities = bench.data["amenity_ids"]
+    if i % len(amenities) == 0:
+        bench.data["reviewer_id"] = bench.new_user(i, "reviewer")
+    return bench.request(
+        "POST",
+        "/api/reviews",
+        user=bench.data["reviewer_id"],
+        json={
+            "amenity_id": amenities[i % len(amenities)],
+            "rating": 4,
+            "comment": "ok",
+        },
+    )
+
+
+@route("GET /api/reviews/amenity/<id>")
+def list_reviews(bench, i):
+    return bench.request("GET", f"/api/reviews/amenity/{bench.pick('reviewed_ids', i)}")
+
+
+@route("GET /api/search")
+def search_all(bench, i):
+    return bench.request("GET", "/api/search")
+
+
+@route("GET /api/search?q")
+def search_text(bench, i):
+    return bench.request("GET", f"/api/search?q={WORDS[i % len(WORDS)]}")
+
+
+@route("GET /api/search?location")
+def search_location(bench, i):
+    return bench.request("GET", f"/api/search?location={CITIES[i % len(CITIES)]}")
+
+
+@route("GET /api/search?amenity_type")
+def search_category(bench, i):
+    return bench.request(
+        "GET", f"/api/search?amenity_type={CATEGORIES[i % len(CATEGORIES)]}"
+    )
+
+
+@route("GET /api/search?booking_date")
+def search_available(bench, i):
+    return bench.request(
+        "GET", f"/api/search?booking_date={bench.data['booking_date']}"
+    )
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def run_route(bench, name, options, counter):
+    """Send a route's requests, returning its latency and query statistics"""
+    make, status = ROUTES[name]
+    total = options.warmup + options.requests
+    with bench.app.app_context():
+        requests = [make(bench, i) for i in range(total)]
+
+    local = threading.local()
+
+    def send(kwargs):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = bench.app.test_client()
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(**kwargs)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        response.close()
+        return elapsed, counter.count, response.status_code
+
+    for kwargs in requests[: options.warmup]:
+        send(kwargs)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        results = list(pool.map(send, requests[options.warmup :]))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, _, code in results if code != status),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(len(results) / wall, 1),
+        "queries": round(sum(count for _, count, _ in results) / len(results), 2),
+    }
+
+
+def compare(results, baseline, options):
+    """Regressions of the results against a baseline, as messages"""
+    failures = []
+    for name, result in results.items():
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} unexpected responses")
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p90_ms"):
+            limit = before[key] * (1 + options.threshold)
+            if result[key] > limit and result[key] - before[key] > options.min_delta:
+                failures.append(
+                    f"{name}: {key} {result[key]:.2f} > {before[key]:.2f} "
+                    f"+{options.threshold:.0%}"
+                )
+        if result["queries"] > before["queries"] + 0.5:
+            failures.append(
+                f"{name}: {result['queries']} queries per request, "
+                f"{before['queries']} in the baseline"
+            )
+    return failures
+
+
+def build_app(options, workdir):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = options.database or (
+            "sqlite:///" + os.path.join(workdir, "bench.db")
+        )
+        MEDIA_ROOT = os.path.join(workdir, "media")
+        RESPONSE_CACHE = "memory" if options.response_cache else "none"
+        JOBS_EAGER = False
+        DATABASE_REPLICA_URLS = []
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--database", help="database URL, a temporary SQLite one by default"
+    )
+    parser.add_argument(
+        "--recreate",
+        action="store_true",
+        help="allow dropping and recreating the tables of --database",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100, help="timed requests per route"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=10, help="untimed requests per route"
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads")
+    parser.add_argument("--route", action="append", help="only routes containing this")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--amenities", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--reviews", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--response-cache", action="store_true", help="keep the response cache on"
+    )
+    parser.add_argument(
+        "--baseline", help="baseline file, baselines/<database>.json by default"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="write the results as the baseline"
+    )
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed latency increase"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=1.0, help="ms ignored in latency increases"
+    )
+    options = parser.parse_args()
+    if options.database and not options.recreate:
+        parser.error("the tables of --database are dropped, confirm with --recreate")
+
+    names = [
+        name
+        for name in ROUTES
+        if not options.route or any(part in name for part in options.route)
+    ]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = build_app(options, workdir)
+        with app.app_context():
+            data = seed(options)
+            dialect = db.engine.dialect.name
+
+            counter = threading.local()
+
+            def count(*args):
+                counter.count = getattr(counter, "count", 0) + 1
+
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", count)
+
+        bench = Bench(app, data)
+        results = {}
+        print(f"{'route':34} {'p50':>8} {'p90':>8} {'p99':>8} {'req/s':>8} {'sql':>6}")
+        for name in names:
+            results[name] = result = run_route(bench, name, options, counter)
+            print(
+                f"{name:34} {result['p50_ms']:8.2f} {result['p90_ms']:8.2f} "
+                f"{result['p99_ms']:8.2f} {result['throughput_rps']:8.1f} "
+                f"{result['queries']:6.1f}"
+                + (f"  {result['errors']} errors" if result["errors"] else "")
+            )
+
+    report = {
+        "meta": {
+            "note": LATENCY_NOTE,
+            "database": dialect,
+            "requests": options.requests,
+            "concurrency": options.concurrency,
+            "users": options.users,
+            "amenities": options.amenities,
+            "bookings": options.bookings,
+            "reviews": options.reviews,
+            "response_cache": options.response_cache,
+            "python": platform.python_version(),
+            "created": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "routes": results,
+    }
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    path = options.baseline or os.path.join(BASELINES, f"{dialect}.json")
+    if options.save:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Saved the baseline to {path}")
+        failures = compare(results, {}, options)
+    elif os.path.exists(path):
+        with open(path) as f:
+            failures = compare(results, json.load(f)["routes"], options)
+    else:
+        print(f"No baseline at {path}, run with --save to record one")
+        failures = compare(results, {}, options)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
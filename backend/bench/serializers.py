@@ -0,0 +1,158 @@
+"""Rows per second of the response serializers
+
+Serializes synthetic amenity list items, search results and bookings with
+flask-restx `marshal` and the json module, as responses were built before,
+and with the compiled serializers and the JSON provider of the app:
+
+    python -m bench.serializers --rows 20000 --repeat 5
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from flask import Flask
+from flask_restx import marshal
+
+from endpoints.amenities_ns import amenity_item_model, serialize_item
+from endpoints.booking_ns import serialize_booking
+from endpoints.filtering_ns import search_model, serialize_result
+from endpoints.serializers import JSONProvider, orjson
+
+
+def amenity_rows(count):
+    return [
+        (
+            SimpleNamespace(
+                id=i,
+                name=f"Amenity {i}",
+                description="Heated pool with changing rooms and parking",
+                price_per_hour=25.0 + i % 40,
+                address=f"{i} Ngong Road, Nairobi",
+                category_id=i % 12,
+                owner_id=i % 300,
+                average_rating=(i % 50) / 10,
+            ),
+            [f"{i}_card.webp", f"{i}_2_card.webp"],
+        )
+        for i in range(count)
+    ]
+
+
+def search_rows(count):
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"Amenity {i}",
+            description="Heated pool with changing rooms and parking",
+            price_per_hour=25.0 + i % 40,
+            address=f"{i} Ngong Road, Nairobi",
+            category_name="pool",
+            average_rating=(i % 50) / 10 or None,
+            reviews_count=i % 90,
+            image_url=f"{i}_card.webp",
+        )
+        for i in range(count)
+    ]
+
+
+def booking_rows(count):
+    start = datetime(2026, 1, 1, 8)
+    return [
+        (
+            SimpleNamespace(
+                id=i,
+                amenity_id=i % 500,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i + 2),
+                status="booked",
+                qr_code=f"{i:032x}.png",
+                expires_at=start + timedelta(hours=i + 1),
+            ),
+            f"Amenity {i % 500}",
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_bookings(rows):
+    """The booking list items as they were built with strftime"""
+    return [
+        {
+            "id": booking.id,
+            "amenity_id": booking.amenity_id,
+            "amenity": amenity_name,
+            "start_time": booking.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": booking.end_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "status": booking.status,
+            "qr_code": booking.qr_code,
+            "expires_at": (
+                booking.expires_at.strftime("%Y-%m-%d %H:%M:%S")
+                if booking.expires_at
+                else None
+            ),
+        }
+        for booking, amenity_name in rows
+    ]
+
+
+def cases(count):
+    amenities = amenity_rows(count)
+    results = search_rows(count)
+    bookings = booking_rows(count)
+    for amenity, images in amenities:
+        amenity.images = images
+    for booking, name in bookings:
+        booking.amenity = name
+    return {
+        "amenities": (
+            lambda: marshal([amenity for amenity, _ in amenities], amenity_item_model),
+            lambda: [serialize_item(amenity, images) for amenity, images in amenities],
+        ),
+        "search": (
+            lambda: marshal(results, search_model),
+            lambda: [serialize_result(row) for row in results],
+        ),
+        "bookings": (
+            lambda: legacy_bookings(bookings),
+            lambda: [serialize_booking(booking, name) for booking, name in bookings],
+        ),
+    }
+
+
+def rate(func, count, repeat):
+    """Best rows per second of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    provider = JSONProvider(app)
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"{args.rows} rows, best of {args.repeat}, encoder {encoder}")
+    print(f"{'':10} {'before':>12} {'compiled':>12} {'+ encoder':>12} {'speedup':>8}")
+    for name, (before, after) in cases(args.rows).items():
+        old = rate(lambda: json.dumps(before()), args.rows, args.repeat)
+        compiled = rate(lambda: json.dumps(after()), args.rows, args.repeat)
+        new = rate(
+            lambda: provider.dumps(after(), sort_keys=False), args.rows, args.repeat
+        )
+        print(
+            f"{name:10} {old:12,.0f} {compiled:12,.0f} {new:12,.0f} {new / old:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from endpoints import bulk, jobs, metrics, synthetic
+from models import Amenity, User, search_index
+
+ratings_cli = AppGroup("ratings", help="Maintain the amenity rating aggregates")
+
+
+@ratings_cli.command("rebuild")
+@click.option("--batch-size", default=1000, show_default=True)
+def rebuild_ratings(batch_size):
+    """Recompute rating sums, counts and histograms from the reviews"""
+    updated = Amenity.rebuild_ratings(batch_size=batch_size)
+    click.echo(f"Rebuilt the ratings of {updated} amenities")
+
+
+search_cli = AppGroup("search", help="Maintain the amenity text search index")
+
+
+@search_cli.command("rebuild")
+def rebuild_search():
+    """Rebuild the text search index from the amenities table"""
+    search_index.rebuild()
+    click.echo("Rebuilt the amenity search index")
+
+
+jobs_cli = AppGroup("jobs", help="Run and maintain the background job queue")
+
+
+@jobs_cli.command("work")
+@click.option("--batch-size", default=50, show_default=True)
+@click.option("--poll-interval", default=1.0, show_default=True)
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty")
+def work_jobs(batch_size, poll_interval, burst):
+    """Run queued jobs"""
+    metrics.init_worker_metrics(current_app)
+    processed = jobs.work(
+        batch_size=batch_size, poll_interval=poll_interval, burst=burst
+    )
+    click.echo(f"Processed {processed} jobs")
+
+
+@jobs_cli.command("purge")
+@click.option("--days", default=7, show_default=True)
+def purge_jobs(days):
+    """Delete finished jobs older than the given number of days"""
+    jobs.purge_jobs(timedelta(days=days))
+    click.echo(f"Purged jobs finished more than {days} days ago")
+
+
+tokens_cli = AppGroup("tokens", help="Maintain the JWT revocation store")
+
+
+@tokens_cli.command("purge")
+def purge_tokens():
+    """Delete revocations of tokens that have expired"""
+    purged = current_app.extensions["token_revocation"].store.purge()
+    click.echo(f"Purged {purged} expired revocations")
+
+
+bulk_cli = AppGroup("bulk", help="Import and export categories, amenities and bookings")
+
+
+def _file_format(fmt, file):
+    if fmt is None:
+        fmt = "csv" if file.name.endswith(".csv") else "ndjson"
+    return fmt
+
+
+@bulk_cli.command("import")
+@click.argument("entity", type=click.Choice(list(bulk.ENTITIES)))
+@click.argument("file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--format", "fmt", type=click.Choice(bulk.FORMATS))
+@click.option("--owner", help="Username owning imported amenities")
+@click.option("--chunk-size", type=int)
+def import_bulk(entity, file, fmt, owner, chunk_size):
+    """Import rows from an NDJSON or CSV file, or - for stdin"""
+    if owner is not None:
+        owner = User.query.filter_by(username=owner).first()
+        if owner is None:
+            raise click.BadParameter("No such user", param_hint="--owner")
+    report = bulk.import_rows(
+        bulk.ENTITIES[entity](owner=owner),
+        bulk.read_rows(file, _file_format(fmt, file)),
+        chunk_size=chunk_size or current_app.config.get("BULK_CHUNK_SIZE", 1000),
+        max_errors=current_app.config.get("BULK_MAX_ERRORS", 1000),
+    )
+    for error in report["errors"]:
+        click.echo(f"Row {error['row']}: {error['error']}", err=True)
+    click.echo(f"Imported {report['inserted']} {entity}, {report['failed']} failed")
+
+
+@bulk_cli.command("export")
+@click.argument("entity", type=click.Choice(list(bulk.ENTITIES)))
+@click.argument("file", type=click.File("w", encoding="utf-8"), default="-")
+@click.option("--format", "fmt", type=click.Choice(bulk.FORMATS))
+@click.option("--batch-size", default=1000, show_default=True)
+def export_bulk(entity, file, fmt, batch_size):
+    """Export rows as NDJSON or CSV to a file, stdout by default"""
+    rows = bulk.export_rows(
+        bulk.ENTITIES[entity](), _file_format(fmt, file), batch_size=batch_size
+    )
+    for chunk in rows:
+        file.write(chunk)
+
+
+data_cli = AppGroup("data", help="Generate synthetic datasets")
+
+
+@data_cli.command("generate")
+@click.option("--users", default=10000, show_default=True)
+@click.option("--amenities", default=2000, show_default=True)
+@click.option("--bookings", default=1000000, show_default=True)
+@click.option("--media", default=3, show_default=True, help="Images per amenity")
+@click.option("--review-rate", default=0.3, show_default=True)
+@click.option("--days", default=365, show_default=True)
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="First booked day")
+@click.option("--alpha", default=1.1, show_default=True, help="Zipf exponent")
+@click.option("--seed", default=1, show_default=True)
+@click.option("--batch-size", default=5000, show_default=True)
+@click.option("--password", default="password", show_default=True)
+def generate_data(**options):
+    """Insert deterministic users, amenities, media, bookings and reviews"""
+    counts = synthetic.generate(**options, echo=click.echo)
+    click.echo(
+        "Generated " + ", ".join(f"{count} {table}" for table, count in counts.items())
+    )
@@ -1,6 +1,7 @@
 import os
 
-from decouple import config
+from decouple import Csv, config
+from sqlalchemy.pool import NullPool
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 
@@ -11,6 +12,108 @@ class Config:
     SECRET_KEY = config("SECRET_KEY")
     SQLALCHEMY_TRACK_MODIFICATIONS = config("SQLALCHEMY_TRACK_MODIFICATIONS", cast=bool)
 
+    # Keyset pagination of list endpoints
+    PAGE_SIZE = config("PAGE_SIZE", default=50, cast=int)
+    MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", default=200, cast=int)
+    # Rows read from the cursor per batch of a streamed list response
+    STREAM_BATCH_SIZE = config("STREAM_BATCH_SIZE", default=500, cast=int)
+
+    # Rendered booking QR codes kept in memory per worker
+    QR_CACHE_SIZE = config("QR_CACHE_SIZE", default=256, cast=int)
+
+    # Background jobs, run inline instead of queued when JOBS_EAGER is set
+    JOBS_EAGER = config("JOBS_EAGER", default=False, cast=bool)
+    JOBS_TIMEOUT = config("JOBS_TIMEOUT", default=300, cast=int)
+
+    # Processes resizing uploaded images, 0 for one per CPU
+    IMAGE_WORKERS = config("IMAGE_WORKERS", default=0, cast=int)
+
+    # Media storage, "local" under MEDIA_ROOT (static/ by default) or "s3"
+    MEDIA_STORAGE = config("MEDIA_STORAGE", default="local")
+    MEDIA_ROOT = config("MEDIA_ROOT", default="")
+    S3_BUCKET = config("S3_BUCKET", default="")
+    S3_PREFIX = config("S3_PREFIX", default="")
+    S3_ENDPOINT_URL = config("S3_ENDPOINT_URL", default="")
+    S3_REGION = config("S3_REGION", default="")
+    S3_PUBLIC_URL = config("S3_PUBLIC_URL", default="")
+
+    # Password hashing, any werkzeug method such as "scrypt:32768:8:1" or
+    # "pbkdf2:sha256:600000". Stored hashes are upgraded on login.
+    PASSWORD_HASH_METHOD = config("PASSWORD_HASH_METHOD", default="scrypt")
+    PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=2, cast=int)
+    PASSWORD_HASH_QUEUE = config("PASSWORD_HASH_QUEUE", default=16, cast=int)
+    PASSWORD_HASH_TIMEOUT = config("PASSWORD_HASH_TIMEOUT", default=10, cast=float)
+
+    # JWT revocation, REVOCATION_STORE is "database", "redis" or "memory"
+    REVOCATION_STORE = config("REVOCATION_STORE", default="database")
+    REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+    REVOCATION_CACHE_SIZE = config("REVOCATION_CACHE_SIZE", default=10000, cast=int)
+    REVOCATION_CACHE_TTL = config("REVOCATION_CACHE_TTL", default=5, cast=float)
+
+    # Users loaded for JWT-authenticated requests, cached per worker
+    USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=1000, cast=int)
+    USER_CACHE_TTL = config("USER_CACHE_TTL", default=30, cast=float)
+
+    # Cached catalog and search responses, RESPONSE_CACHE is "memory", "redis"
+    # or "none". Entries are keyed by table versions, the TTL only bounds memory.
+    RESPONSE_CACHE = config("RESPONSE_CACHE", default="memory")
+    RESPONSE_CACHE_SIZE = config("RESPONSE_CACHE_SIZE", default=1024, cast=int)
+    RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=30, cast=float)
+
+    # Postgres statement_timeout in ms per endpoint class, 0 for none. Resources
+    # pick a class with a `timeout_class` attribute, otherwise read or write.
+    STATEMENT_TIMEOUTS = {
+        "read": config("DB_READ_TIMEOUT", default=5000, cast=int),
+        "write": config("DB_WRITE_TIMEOUT", default=10000, cast=int),
+        "search": config("DB_SEARCH_TIMEOUT", default=3000, cast=int),
+        "bulk": config("DB_BULK_TIMEOUT", default=60000, cast=int),
+    }
+
+    # Read replicas for GET requests, comma separated. Replicas lagging more than
+    # REPLICA_MAX_LAG seconds are skipped, users stay on the primary for
+    # REPLICA_STICKY_SECONDS after a write, tracked in REPLICA_STICKY_STORE,
+    # "redis" or "memory" for a single worker.
+    DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+    REPLICA_MAX_LAG = config("REPLICA_MAX_LAG", default=5, cast=float)
+    REPLICA_LAG_CHECK_INTERVAL = config(
+        "REPLICA_LAG_CHECK_INTERVAL", default=2, cast=float
+    )
+    REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=int)
+    REPLICA_STICKY_STORE = config("REPLICA_STICKY_STORE", default="redis")
+
+    # Per-request SQL profiling of a sample of requests, with a Server-Timing
+    # header and a logged summary flagging statements repeated this many times
+    SQL_PROFILER = config("SQL_PROFILER", default=False, cast=bool)
+    SQL_PROFILER_SAMPLE_RATE = config(
+        "SQL_PROFILER_SAMPLE_RATE", default=1.0, cast=float
+    )
+    SQL_PROFILER_REPEAT_THRESHOLD = config(
+        "SQL_PROFILER_REPEAT_THRESHOLD", default=5, cast=int
+    )
+
+    # Prometheus metrics served at METRICS_PATH, to scrapes sending the bearer
+    # METRICS_TOKEN when it is set. With several worker processes
+    # PROMETHEUS_MULTIPROC_DIR must be set, see gunicorn.conf.py. Job workers
+    # without it serve their metrics on METRICS_HOST:METRICS_PORT
+    METRICS = config("METRICS", default=False, cast=bool)
+    METRICS_PATH = config("METRICS_PATH", default="/metrics")
+    METRICS_TOKEN = config("METRICS_TOKEN", default="")
+    METRICS_HOST = config("METRICS_HOST", default="127.0.0.1")
+    METRICS_PORT = config("METRICS_PORT", default=0, cast=int)
+
+    # Connection checkouts waiting longer than this many seconds are logged
+    DB_POOL_SLOW_CHECKOUT = config("DB_POOL_SLOW_CHECKOUT", default=0.1, cast=float)
+
+    # Bulk imports and exports, rows per chunk and per-row errors reported
+    BULK_CHUNK_SIZE = config("BULK_CHUNK_SIZE", default=1000, cast=int)
+    BULK_MAX_ERRORS = config("BULK_MAX_ERRORS", default=1000, cast=int)
+
+    # Uploaded media serving, MEDIA_SENDFILE is "", "x-accel" or "x-sendfile"
+    MEDIA_MAX_AGE = config("MEDIA_MAX_AGE", default=31536000, cast=int)
+    MEDIA_SENDFILE = config("MEDIA_SENDFILE", default="")
+    MEDIA_ACCEL_PREFIX = config("MEDIA_ACCEL_PREFIX", default="/protected/")
+    USE_X_SENDFILE = MEDIA_SENDFILE == "x-sendfile"
+
 
 class DevConfig(Config):
     """Defines development configuration"""
@@ -18,11 +121,44 @@ class DevConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "dev.db")
     DEBUG = True
     SQLALCHEMY_ECHO = True
+    JOBS_EAGER = config("JOBS_EAGER", default=True, cast=bool)
+
+
+class TestConfig(Config):
+    """Defines test configuration"""
+
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    TESTING = True
+    # Errors are answered as in production instead of raised in the tests
+    PROPAGATE_EXCEPTIONS = False
+    RESPONSE_CACHE = "none"
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
 
 
 class ProdConfig(Config):
     """Defines production configuration"""
-    SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI = config('DATABASE_URL')
+
+    SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI = config("DATABASE_URL")
     DEBUG = config("DEBUG", cast=bool)
     SQLALCHEMY_ECHO = config("ECHO", cast=bool)
-    SQLALCHEMY_TRACK_MODIFICATIONS = config("SQLALCHEMY_TRACK_MODIFICATIONS", cast=bool)
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = config("SQLALCHEMY_TRACK_MODIFICATIONS", cast=bool)
+
+    # Connection pool of each worker. With DB_PGBOUNCER set connections are not
+    # kept here and PgBouncer in transaction mode does the pooling.
+    DB_PGBOUNCER = config("DB_PGBOUNCER", default=False, cast=bool)
+    DB_CONNECT_TIMEOUT = config("DB_CONNECT_TIMEOUT", default=10, cast=int)
+    DB_CONNECT_ARGS = {"connect_timeout": DB_CONNECT_TIMEOUT}
+    if DB_PGBOUNCER:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "poolclass": NullPool,
+            "connect_args": DB_CONNECT_ARGS,
+        }
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "pool_size": config("DB_POOL_SIZE", default=5, cast=int),
+            "max_overflow": config("DB_MAX_OVERFLOW", default=10, cast=int),
+            "pool_timeout": config("DB_POOL_TIMEOUT", default=30, cast=float),
+            "pool_recycle": config("DB_POOL_RECYCLE", default=1800, cast=int),
+            "pool_pre_ping": config("DB_POOL_PRE_PING", default=True, cast=bool),
+            "connect_args": DB_CONNECT_ARGS,
+        }
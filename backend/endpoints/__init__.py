@@ -1,6 +1,7 @@
 from .amenities_ns import amenities_ns
 from .auth import auth_ns
 from .booking_ns import booking_ns
+from .bulk_ns import bulk_ns
 from .filtering_ns import search_ns
 from .qr_code_util import generate_qr_code
 from .reviews_ns import reviews_ns
@@ -1,10 +1,20 @@
+from collections import defaultdict
+
 from flask import jsonify, make_response, request
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import current_user, jwt_required
 from flask_restx import Namespace, Resource, fields
+from sqlalchemy import func
 
+from exts import db
 from models import Amenity, Category, Media, Review, User
 
-from .images import delete_image_file, save_image
+from .conditional import conditional
+from .images import save_image
+from .jobs import enqueue
+from .pagination import next_page_headers, page_args
+from .response_cache import cached
+from .serializers import compile_model
+from .streaming import batch_size, stream_format, stream_response
 
 amenities_ns = Namespace("Amenities", description="Amenities management")
 
@@ -33,45 +43,95 @@ amenities_model = amenities_ns.model(
     },
 )
 
+# List items, with the card images of the amenity
+amenity_item_model = amenities_ns.clone(
+    "AmenityItem",
+    amenities_model,
+    {
+        "images": fields.List(fields.String),
+        "rating": fields.Float(attribute="average_rating"),
+    },
+)
+
+# Amenity details
+amenity_detail_model = amenities_ns.model(
+    "AmenityDetail",
+    {
+        "name": fields.String(),
+        "description": fields.String(),
+        "price_per_hour": fields.Float(),
+        "address": fields.String(),
+        "category_id": fields.Integer(),
+        "owner_id": fields.Integer(),
+        "images": fields.List(fields.String),
+        "image_variants": fields.List(fields.Raw),
+        "rating": fields.Float(attribute="average_rating"),
+        "rating_count": fields.Integer(),
+        "rating_histogram": fields.Raw(),
+    },
+)
+
+category_model = amenities_ns.model(
+    "Category",
+    {
+        "id": fields.Integer(readonly=True),
+        "name": fields.String(required=True),
+    },
+)
+
+serialize_amenity = compile_model(amenities_model)
+serialize_item = compile_model(amenity_item_model, args=("images",))
+serialize_detail = compile_model(
+    amenity_detail_model, args=("images", "image_variants")
+)
+serialize_category = compile_model(category_model)
+
+
+def serialize_amenities(rows):
+    """List items of amenities, their card images loaded in one query"""
+    images = defaultdict(list)
+    if rows:
+        media = (
+            db.session.query(Media.amenity_id, func.coalesce(Media.card_url, Media.url))
+            .filter(Media.amenity_id.in_([amenity.id for amenity in rows]))
+            .order_by(Media.id)
+        )
+        for amenity_id, url in media:
+            images[amenity_id].append(url)
+
+    return [serialize_item(amenity, images[amenity.id]) for amenity in rows]
+
 
 @amenities_ns.route("")
 class AmenitiesListResource(Resource):
-    # @amenities_ns.marshal_list_with(amenities_model)
+    @amenities_ns.response(200, "Success", [amenity_item_model])
+    @conditional("amenities", "media", "reviews")
     def get(self):
-        """Lists all amenities"""
-        amenities = Amenity.query.all()
-        response = []
-        for amenity in amenities:
-            avg_rating = (
-                sum(review.rating for review in amenity.reviews) / len(amenity.reviews)
-                if amenity.reviews
-                else 0
-            )
-            images = [media.url for media in amenity.images]
-
-            response.append(
-                {
-                    "id": amenity.id,
-                    "name": amenity.name,
-                    "description": amenity.description,
-                    "price_per_hour": amenity.price_per_hour,
-                    "address": amenity.address,
-                    "category_id": amenity.category_id,
-                    "owner_id": amenity.owner_id,
-                    "images": images,
-                    "rating": avg_rating,
-                }
+        """Lists amenities a page at a time, ordered by id, or all of them
+        streamed"""
+        limit, after = page_args()
+
+        query = Amenity.query.order_by(Amenity.id)
+        if after is not None:
+            query = query.filter(Amenity.id > after)
+
+        fmt = stream_format()
+        if fmt:
+            return stream_response(
+                query.yield_per(batch_size()), serialize_amenities, fmt
             )
 
-        return response, 200
+        rows, headers = next_page_headers(
+            query.limit(limit + 1).all(), limit, key=lambda amenity: amenity.id
+        )
+        return serialize_amenities(rows), 200, headers
 
     @jwt_required()
     @amenities_ns.expect(amenities_model)
-    @amenities_ns.marshal_with(amenities_model)
+    @amenities_ns.response(201, "Created", amenities_model)
     def post(self):
         """Create a new amenity"""
         data = request.form.to_dict()
-        user_id = get_jwt_identity()
         category_name = data.get("category")
         category = Category.query.filter_by(name=category_name).first()
 
@@ -81,52 +141,47 @@ class AmenitiesListResource(Resource):
             price_per_hour=data.get("price_per_hour"),
             address=data.get("address"),
             category_id=category.id,
-            owner_id=user_id,
+            owner_id=current_user.id,
         )
-        new_amenity.save()
 
+        # The amenity and its images are inserted in one flush, the images
+        # as a single batched INSERT
         images = request.files.getlist("images")
         for image in images:
             filename = save_image(image)
             if filename:
-                media = Media(url=filename, type="image", amenity_id=new_amenity.id)
-                media.save()
+                new_amenity.images.append(Media(url=filename, type="image"))
+        new_amenity.save()
+
+        # Resize the uploads in the background
+        if new_amenity.images:
+            enqueue(
+                "process_images", media_ids=[media.id for media in new_amenity.images]
+            )
 
-        return new_amenity, 201
+        return serialize_amenity(new_amenity), 201
 
 
 @amenities_ns.route("/<int:id>")
 class AmenityResource(Resource):
 
+    @amenities_ns.response(200, "Success", amenity_detail_model)
+    @conditional("amenities", "media", "reviews")
+    @cached("amenity", ("amenities", "media", "reviews"))
     def get(self, id):
         amenity = Amenity.query.get_or_404(id)
 
-        avg_rating = (
-            sum(review.rating for review in amenity.reviews) / len(amenity.reviews)
-            if amenity.reviews
-            else 0
-        )
         images = [media.url for media in amenity.images]
-        response = {
-            "name": amenity.name,
-            "description": amenity.description,
-            "price_per_hour": amenity.price_per_hour,
-            "address": amenity.address,
-            "category_id": amenity.category_id,
-            "owner_id": amenity.owner_id,
-            "images": images,
-            "rating": avg_rating,
-        }
-        return response, 200
+        variants = [media.variants or {} for media in amenity.images]
+        return serialize_detail(amenity, images, variants), 200
 
     @jwt_required()
-    @amenities_ns.marshal_with(amenities_model)
+    @amenities_ns.response(200, "Success", amenities_model)
     def put(self, id):
         """Update an amenity"""
         amenity = Amenity.query.get_or_404(id)
-        user_id = get_jwt_identity()
 
-        if amenity.owner_id != user_id:
+        if amenity.owner_id != current_user.id:
             amenities_ns.abort(403, message="Not authorized to update this amenity")
 
         # Update basic amenity data
@@ -154,32 +209,43 @@ class AmenityResource(Resource):
         ):
             # Delete all existing images
             for media in amenity.images:
-                delete_image_file(media.file_path)
-                media.delete()
+                enqueue(
+                    "delete_image_file",
+                    file_path=media.url,
+                    variants=media.filenames()[1:],
+                )
+            amenity.images.clear()
 
-        # Add new images
+        # Add new images, inserted together with the changes above
         images = request.files.getlist("images")
+        new_media = []
         for image in images:
             filename = save_image(image)
             if filename:
-                media = Media(url=filename, amenity_id=amenity.id, type="image")
-                media.save()
+                new_media.append(Media(url=filename, type="image"))
+
+        if new_media:
+            amenity.images.extend(new_media)
+            db.session.flush()
+            enqueue("process_images", media_ids=[media.id for media in new_media])
 
-        return amenity, 200
+        return serialize_amenity(amenity), 200
 
     @jwt_required()
     def delete(self, id):
         """Delete an amenity"""
         amenity = Amenity.query.get_or_404(id)
-        user_id = get_jwt_identity()
 
-        if amenity.owner_id != user_id:
+        if amenity.owner_id != current_user.id:
             amenities_ns.abort(403, message="Not authorized to delete this amenity")
 
-        # Delete all associated images
+        # Delete all associated image files, the rows go with the amenity
         for media in amenity.images:
-            delete_image_file(media.url)
-            media.delete()
+            enqueue(
+                "delete_image_file",
+                file_path=media.url,
+                variants=media.filenames()[1:],
+            )
 
         # Delete the amenity
         amenity.delete()
@@ -191,18 +257,16 @@ class AmenityResource(Resource):
 class AmenityResourceCategory(Resource):
     def post(self):
         data = request.get_json()
-        new_category =  Category (name=data.get('name'))
+        new_category = Category(name=data.get("name"))
         new_category.save()
-        return make_response(jsonify({"message": "Successfully created new category!"}), 200)
+        return make_response(
+            jsonify({"message": "Successfully created new category!"}), 200
+        )
 
+    @amenities_ns.response(200, "Success", [category_model])
+    @conditional("categories")
+    @cached("categories", ("categories",))
     def get(self):
         """Fetches all the categories"""
         categories = Category.query.all()
-        category_names = [
-            {
-                "id": category.id,
-                "name": category.name,
-            }
-            for category in categories
-        ]
-        return category_names, 200
+        return [serialize_category(category) for category in categories], 200
@@ -1,18 +1,21 @@
-import os
 import re
-import time
 from datetime import timedelta
 
-from flask import current_app, jsonify, make_response, request
+from flask import jsonify, make_response, request
 from flask_jwt_extended import (JWTManager, create_access_token,
-                                create_refresh_token, get_jwt,
+                                create_refresh_token, current_user, get_jwt,
                                 get_jwt_identity, jwt_required)
 from flask_restx import Namespace, Resource, fields
-from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
 
 from models import User
 
+from .images import store_upload
+from .jobs import enqueue, task
+from .passwords import HasherBusy, hash_password, verify_password
+from .revocation import revoke_token
+from .serializers import compile_model
+from .storage import get_storage
+
 auth_ns = Namespace("auth", description="User Authentication")
 
 
@@ -23,6 +26,24 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@task("delete_profile_image")
+def delete_profile_image(filename):
+    """Delete a replaced profile image"""
+    # Content-addressed files may be shared by several users
+    if User.query.filter_by(profile=filename).first():
+        return
+
+    get_storage().delete("profile_images", filename)
+
+
+def busy_response():
+    response = make_response(
+        jsonify({"message": "Server is busy, please try again shortly"}), 503
+    )
+    response.headers["Retry-After"] = "1"
+    return response
+
+
 # Serilization models
 signup_model = auth_ns.model(
     "Signup",
@@ -40,6 +61,17 @@ signup_model = auth_ns.model(
     },
 )
 
+# Profile of the current user, the signup fields without the passwords
+profile_model = auth_ns.model(
+    "Profile",
+    {
+        key: field
+        for key, field in signup_model.items()
+        if key not in ("password", "password_confirmation")
+    },
+)
+serialize_profile = compile_model(profile_model)
+
 
 login_model = auth_ns.model(
     "Login",
@@ -92,13 +124,18 @@ class SignupResource(Resource):
         if isinstance(is_owner, str):
             is_owner = is_owner.lower() == "true"
 
+        try:
+            password_hash = hash_password(password)
+        except HasherBusy:
+            return busy_response()
+
         # create new user
         new_user = User(
             firstname=data.get("firstname"),
             lastname=data.get("lastname"),
             username=data.get("username"),
             email=data.get("email"),
-            password=generate_password_hash(data.get("password")),
+            password=password_hash,
             verified=False,
             is_owner=is_owner,
         )
@@ -119,19 +156,16 @@ class SignupResource(Resource):
 @auth_ns.route("/user")
 class ProfileResource(Resource):
 
-    @auth_ns.marshal_with(signup_model)
+    @auth_ns.response(200, "Success", profile_model)
     @jwt_required()
     def get(self):
         """Get User by id"""
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first_or_404()
-        return user, 200
+        return serialize_profile(current_user), 200
 
     @jwt_required()
     def put(self):
         """Updates User by id"""
-        user_id = get_jwt_identity()
-        user_to_update = User.query.filter_by(id=user_id).first_or_404()
+        user_to_update = current_user
 
         # Handle form data and file upload
         profile = request.files.get("profile")
@@ -145,29 +179,11 @@ class ProfileResource(Resource):
         # Handle Profile image upload
         image_path = None
         if profile and allowed_file(profile.filename):
-            filename = secure_filename(profile.filename)
-            # Create unique filename using user_id and timestamp
-            file_extension = filename.rsplit(".", 1)[1].lower()
-            unique_filename = f"profile_{user_id}_{int(time.time())}.{file_extension}"
-
-            # Ensure upload directory exists
-            upload_dir = os.path.join(current_app.root_path, "static", "profile_images")
-            os.makedirs(upload_dir, exist_ok=True)
-
-            # Save the file
-            file_path = os.path.join(upload_dir, unique_filename)
-            profile.save(file_path)
-
-            # Store the relative path in the database
-            image_path = f"{unique_filename}"
+            image_path = store_upload(profile, "profile_images")
 
             # Delete old profile image if it exists
-            if user_to_update.profile:
-                old_image_path = os.path.join(
-                    current_app.root_path, user_to_update.profile.lstrip("/")
-                )
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
+            if user_to_update.profile and user_to_update.profile != image_path:
+                enqueue("delete_profile_image", filename=user_to_update.profile)
 
         user_to_update.update(
             firstname=data.get("firstname"),
@@ -184,8 +200,9 @@ class ProfileResource(Resource):
     @jwt_required()
     def delete(self):
         """Deletes a User"""
-        user_id = get_jwt_identity()
-        user_to_delete = User.query.filter_by(id=user_id).first_or_404()
+        user_to_delete = current_user
+        if user_to_delete.profile:
+            enqueue("delete_profile_image", filename=user_to_delete.profile)
         user_to_delete.delete()
         return make_response(jsonify({"message": "User deleted successfully"}), 200)
 
@@ -208,7 +225,12 @@ class LoginResource(Resource):
 
         # Check if the user exits
         db_user = User.query.filter_by(username=username).first()
-        if db_user and check_password_hash(db_user.password, password):
+        try:
+            valid = db_user is not None and verify_password(db_user, password)
+        except HasherBusy:
+            return busy_response()
+
+        if valid:
             access_token = create_access_token(
                 identity=db_user.id, expires_delta=timedelta(hours=1)
             )
@@ -234,18 +256,15 @@ class RefreshResource(Resource):
     @jwt_required(refresh=True)
     def post(self):
         """Refreshes the access token"""
-        current_user = get_jwt_identity()
-        new_access_token = create_access_token(identity=current_user, fresh=False)
+        identity = get_jwt_identity()
+        new_access_token = create_access_token(identity=identity, fresh=False)
         return make_response(jsonify({"access_token": new_access_token}), 200)
 
 
 @auth_ns.route("/logout")
 class LogoutResource(Resource):
-    jwt_blocklist = set()
-
     @jwt_required()
     def post(self):
         """Logs out a User"""
-        jti = get_jwt()["jti"]
-        self.jwt_blocklist.add(jti)
+        revoke_token(get_jwt())
         return make_response(jsonify({"message": "Successfully logged out"}), 201)
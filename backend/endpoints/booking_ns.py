@@ -1,13 +1,18 @@
 import json
 from datetime import datetime, timedelta
 
-from flask import jsonify, make_response, request
+from flask import Response, abort, jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_restx import Namespace, Resource, fields
+from sqlalchemy.exc import IntegrityError
 
+from exts import db
 from models import Amenity, Booking
 
-from .qr_code_util import delete_qr_code, generate_qr_code
+from .jobs import enqueue
+from .qr_code_util import QR_FORMATS, generate_qr_code, render_qr_code
+from .serializers import Timestamp, compile_model
+from .streaming import batch_size, stream_format, stream_response
 
 booking_ns = Namespace("Bookings", description="Amenity Booking Management")
 
@@ -26,36 +31,61 @@ booking_model = booking_ns.model(
     },
 )
 
+# Bookings of the user, with the name of their amenity
+booking_item_model = booking_ns.model(
+    "BookingItem",
+    {
+        "id": fields.Integer(),
+        "amenity_id": fields.Integer(),
+        "amenity": fields.String(),
+        "start_time": Timestamp(),
+        "end_time": Timestamp(),
+        "status": fields.String(),
+        "qr_code": fields.String(),
+        "expires_at": Timestamp(),
+    },
+)
+
+serialize_booking = compile_model(booking_item_model, args=("amenity",))
+
+
+def qr_code_payload(amenity, start_time, end_time):
+    """Data encoded in the QR code of a booking"""
+    return json.dumps(
+        {
+            "Amenity": amenity.name,
+            "Start": start_time.isoformat(),
+            "End": end_time.isoformat(),
+        }
+    )
+
+
+def serialize_bookings(rows):
+    """List items of (booking, amenity name) rows"""
+    return [serialize_booking(booking, amenity_name) for booking, amenity_name in rows]
+
 
 @booking_ns.route("")
 class BookingListResource(Resource):
     @jwt_required()
-    # @booking_ns.marshal_with(booking_model)
+    @booking_ns.response(200, "Success", [booking_item_model])
     def get(self):
         """Retrieve all bookings for the authenticated user"""
         user_id = get_jwt_identity()
-        bookings = Booking.query.filter_by(user_id=user_id).all()
-        serialized_bookings = []
-
-        for booking in bookings:
-            booked_amenity = Amenity.query.filter_by(id=booking.amenity_id).first()
-            serialized_booking = {
-                "id": booking.id,
-                "amenity_id": booking.amenity_id,
-                "amenity": booked_amenity.name,
-                "start_time": booking.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "end_time": booking.end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "status": booking.status,
-                "qr_code": booking.qr_code,
-                "expires_at": (
-                    booking.expires_at.strftime("%Y-%m-%d %H:%M:%S")
-                    if booking.expires_at
-                    else None
-                ),
-            }
-            serialized_bookings.append(serialized_booking)
-
-        return jsonify(serialized_bookings)
+        query = (
+            db.session.query(Booking, Amenity.name)
+            .join(Amenity, Booking.amenity_id == Amenity.id)
+            .filter(Booking.user_id == user_id)
+            .order_by(Booking.id)
+        )
+
+        fmt = stream_format()
+        if fmt:
+            return stream_response(
+                query.yield_per(batch_size()), serialize_bookings, fmt
+            )
+
+        return jsonify(serialize_bookings(query.all()))
 
     @jwt_required()
     def post(self):
@@ -66,34 +96,30 @@ class BookingListResource(Resource):
         # Validate the dates
         start_date = datetime.fromisoformat(data["start_date"])
         end_date = datetime.fromisoformat(data["end_date"])
-
-        # Check if the amenity is booked
-        booked = Booking.query.filter_by(
-            amenity_id=data["amenity_id"],
-            start_time=start_date,
-            end_time=end_date,
-            status="booked",
-        ).first()
-
-        if booked:
+        if end_date <= start_date:
             return make_response(
-                jsonify({"message": "Amenity is booked. Try another time"}), 404
+                jsonify({"message": "End time must be after start time"}), 400
             )
 
-        # Generate the booking QRCode
-        amenity = Amenity.query.filter_by(id=data["amenity_id"]).first()
-        qr_code_data = {
-            "Amenity": amenity.name,
-            "Start": start_date.isoformat(),
-            "End": end_date.isoformat(),
-        }
-        qr_code_link = generate_qr_code(json.dumps(qr_code_data))
+        # Generate the booking QRCode key, the image is rendered on request
+        amenity = Amenity.query.get_or_404(data["amenity_id"])
+        qr_code_data = qr_code_payload(amenity, start_date, end_date)
+        qr_code_link = generate_qr_code(qr_code_data)
         expiry_time = start_date + timedelta(hours=1)
 
+        # Check if the amenity is booked, holding the amenity lock until the
+        # booking is committed so concurrent requests cannot both pass
+        Booking.lock_amenity(amenity.id)
+        if Booking.overlapping(amenity.id, start_date, end_date).first():
+            db.session.rollback()
+            return make_response(
+                jsonify({"message": "Amenity is booked. Try another time"}), 409
+            )
+
         # Create a new booking
         new_booking = Booking(
             user_id=user_id,
-            amenity_id=data["amenity_id"],
+            amenity_id=amenity.id,
             start_time=start_date,
             end_time=end_date,
             status="booked",
@@ -101,7 +127,15 @@ class BookingListResource(Resource):
             expires_at=expiry_time,
         )
 
-        new_booking.save()
+        enqueue("warm_qr_code", key=qr_code_link, data=qr_code_data)
+        try:
+            new_booking.save()
+        except IntegrityError:
+            # Overlap caught by the Postgres exclusion constraint
+            db.session.rollback()
+            return make_response(
+                jsonify({"message": "Amenity is booked. Try another time"}), 409
+            )
 
         return make_response(jsonify({"message": "Booking successful!"}), 201)
 
@@ -117,31 +151,51 @@ class BookingManagementResource(Resource):
         # Check if the booking exists
         booking = Booking.query.filter_by(id=booking_id, user_id=user_id).first_or_404()
 
-        # Update the booking status
-        booking.start_time = datetime.fromisoformat(
+        # Validate the new dates
+        start_time = datetime.fromisoformat(
             data.get("start_date", booking.start_time.isoformat())
         )
-        booking.end_time = datetime.fromisoformat(
+        end_time = datetime.fromisoformat(
             data.get("end_date", booking.end_time.isoformat())
         )
-        start_time = datetime.fromisoformat(
-            data.get("start_date", booking.start_time.isoformat())
-        )
-        booking.expires_at = start_time + timedelta(hours=1)
+        if end_time <= start_time:
+            return make_response(
+                jsonify({"message": "End time must be after start time"}), 400
+            )
 
         # Regenerate the qr_code
         amenity = Amenity.query.filter_by(id=booking.amenity_id).first()
-        booking.qr_code = generate_qr_code(
-            json.dumps(
-                {
-                    "Amenity": amenity.name,
-                    "Start": booking.start_time.isoformat(),
-                    "End": booking.end_time.isoformat(),
-                }
+        qr_code_data = qr_code_payload(amenity, start_time, end_time)
+        qr_code_link = generate_qr_code(qr_code_data)
+
+        # Check the new period against the other bookings of the amenity
+        Booking.lock_amenity(booking.amenity_id)
+        conflict = Booking.overlapping(
+            booking.amenity_id, start_time, end_time, exclude_id=booking.id
+        ).first()
+        if conflict:
+            db.session.rollback()
+            return make_response(
+                jsonify({"message": "Amenity is booked. Try another time"}), 409
             )
-        )
 
-        booking.save()
+        # Update the booking
+        old_qr_code = booking.qr_code
+        booking.start_time = start_time
+        booking.end_time = end_time
+        booking.expires_at = start_time + timedelta(hours=1)
+        booking.qr_code = qr_code_link
+        if old_qr_code != qr_code_link:
+            enqueue("delete_qr_code", key=old_qr_code)
+            enqueue("warm_qr_code", key=qr_code_link, data=qr_code_data)
+
+        try:
+            booking.save()
+        except IntegrityError:
+            db.session.rollback()
+            return make_response(
+                jsonify({"message": "Amenity is booked. Try another time"}), 409
+            )
 
         return make_response(jsonify({"message": "Booking updated successfully"}), 200)
 
@@ -150,6 +204,29 @@ class BookingManagementResource(Resource):
         """Delete a booking"""
         user_id = get_jwt_identity()
         booking = Booking.query.filter_by(id=booking_id, user_id=user_id).first_or_404()
-        delete_qr_code(booking.qr_code)
+        enqueue("delete_qr_code", key=booking.qr_code)
         booking.delete()
         return make_response(jsonify({"message": "Booking deleted successfully"}), 200)
+
+
+@booking_ns.route("/qr/<string:filename>")
+class BookingQRCodeResource(Resource):
+    def get(self, filename):
+        """Serve a booking QR code as <key>.png or <key>.svg"""
+        key, _, fmt = filename.rpartition(".")
+        if fmt not in QR_FORMATS:
+            abort(404)
+
+        image = render_qr_code(key, fmt)
+        if image is None:
+            booking = Booking.query.filter_by(qr_code=key).first_or_404()
+            payload = qr_code_payload(
+                booking.amenity, booking.start_time, booking.end_time
+            )
+            image = render_qr_code(key, fmt, payload)
+
+        # The key is derived from the content, so the image never changes
+        response = Response(image, mimetype=QR_FORMATS[fmt])
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        response.set_etag(f"{key}.{fmt}")
+        return response.make_conditional(request)
@@ -0,0 +1,448 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+
+from exts import db
+from models import Amenity, Booking, Category, User, search_index
+from models.table_version import mark_changed
+
+from .booking_ns import qr_code_payload
+from .qr_code_util import generate_qr_code
+
+# Bulk import and export of categories, amenities and bookings as NDJSON or
+# CSV. Imports read the input as a stream and handle it a chunk at a time:
+# the rows of a chunk are validated with one lookup query per reference,
+# inserted with one executemany INSERT (COPY on Postgres with psycopg2) and
+# committed. A chunk the database rejects is retried row by row to report the
+# offending rows. Exports iterate a server-side cursor, so neither direction
+# holds more than a chunk in memory.
+
+FORMATS = ("ndjson", "csv")
+
+
+def read_rows(stream, fmt):
+    """Rows of a text stream as dicts, or a ValueError for unreadable rows"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value != ""}
+        return
+
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+            continue
+        yield row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def _text(row, key, max_length=None):
+    value = row.get(key)
+    if value is None or not str(value).strip():
+        raise ValueError(f"{key} is required")
+    value = str(value).strip()
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters")
+    return value
+
+
+def _int(row, key):
+    try:
+        return int(row[key])
+    except KeyError:
+        raise ValueError(f"{key} is required")
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
+
+
+def _float(row, key):
+    try:
+        return float(row[key])
+    except KeyError:
+        raise ValueError(f"{key} is required")
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number")
+
+
+def _datetime(row, key):
+    try:
+        return datetime.fromisoformat(str(row[key]))
+    except KeyError:
+        raise ValueError(f"{key} is required")
+    except ValueError:
+        raise ValueError(f"{key} must be an ISO 8601 date and time")
+
+
+def _ids(rows, key):
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row[key]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return ids
+
+
+class BulkEntity:
+    """Validation, insertion and export of one table
+
+    `owner` restricts imports and exports to the amenities of that user, it is
+    None for the CLI.
+    """
+
+    model = None
+    columns = ()
+
+    def __init__(self, owner=None):
+        self.owner = owner
+
+    def prepare(self, rows):
+        """Load what the rows of a chunk reference, before validating them"""
+
+    def validate(self, row):
+        """Column values of a row, raising ValueError when it is invalid"""
+        raise NotImplementedError
+
+    def inserted(self, connection, values):
+        """Called with the values of rows inserted in this transaction"""
+
+    def export_query(self):
+        raise NotImplementedError
+
+
+class CategoryBulk(BulkEntity):
+    model = Category
+    columns = ("name",)
+
+    def prepare(self, rows):
+        names = {str(row.get("name", "")).strip() for row in rows}
+        self.taken = set(
+            db.session.scalars(select(Category.name).where(Category.name.in_(names)))
+        )
+
+    def validate(self, row):
+        name = _text(row, "name", 255)
+        if name in self.taken:
+            raise ValueError(f"Category {name!r} already exists")
+        self.taken.add(name)
+        return {"name": name}
+
+    def export_query(self):
+        return select(Category.id, Category.name).order_by(Category.id)
+
+
+class AmenityBulk(BulkEntity):
+    model = Amenity
+    columns = (
+        "name",
+        "description",
+        "price_per_hour",
+        "address",
+        "category_id",
+        "owner_id",
+    )
+
+    def prepare(self, rows):
+        names = {str(row.get("name", "")).strip() for row in rows}
+        self.taken = set(
+            db.session.scalars(select(Amenity.name).where(Amenity.name.in_(names)))
+        )
+        categories = {str(row["category"]).strip() for row in rows if "category" in row}
+        self.categories = dict(
+            db.session.execute(
+                select(Category.name, Category.id).where(Category.name.in_(categories))
+            ).all()
+        )
+        self.category_ids = set(
+            db.session.scalars(
+                select(Category.id).where(Category.id.in_(_ids(rows, "category_id")))
+            )
+        )
+        self.user_ids = set()
+        if self.owner is None:
+            self.user_ids = set(
+                db.session.scalars(
+                    select(User.id).where(User.id.in_(_ids(rows, "owner_id")))
+                )
+            )
+
+    def validate(self, row):
+        name = _text(row, "name", 255)
+        if name in self.taken:
+            raise ValueError(f"Amenity {name!r} already exists")
+
+        values = {
+            "name": name,
+            "description": _text(row, "description"),
+            "price_per_hour": _float(row, "price_per_hour"),
+            "address": _text(row, "address", 255),
+        }
+        if values["price_per_hour"] < 0:
+            raise ValueError("price_per_hour must not be negative")
+
+        if "category" in row:
+            category = str(row["category"]).strip()
+            if category not in self.categories:
+                raise ValueError(f"Unknown category {category!r}")
+            values["category_id"] = self.categories[category]
+        else:
+            values["category_id"] = _int(row, "category_id")
+            if values["category_id"] not in self.category_ids:
+                raise ValueError(f"Unknown category_id {values['category_id']}")
+
+        if self.owner is not None:
+            values["owner_id"] = self.owner.id
+        else:
+            values["owner_id"] = _int(row, "owner_id")
+            if values["owner_id"] not in self.user_ids:
+                raise ValueError(f"Unknown owner_id {values['owner_id']}")
+
+        self.taken.add(name)
+        return values
+
+    def inserted(self, connection, values):
+        search_index.index_amenities(connection, [row["name"] for row in values])
+
+    def export_query(self):
+        query = (
+            select(
+                Amenity.id,
+                Amenity.name,
+                Amenity.description,
+                Amenity.price_per_hour,
+                Amenity.address,
+                Category.name.label("category"),
+                Amenity.owner_id,
+            )
+            .join(Category, Amenity.category_id == Category.id)
+            .order_by(Amenity.id)
+        )
+        if self.owner is not None:
+            query = query.where(Amenity.owner_id == self.owner.id)
+        return query
+
+
+class BookingBulk(BulkEntity):
+    model = Booking
+    columns = (
+        "user_id",
+        "amenity_id",
+        "start_time",
+        "end_time",
+        "status",
+        "qr_code",
+        "expires_at",
+    )
+    statuses = ("booked", "canceled", "checked_in")
+
+    def prepare(self, rows):
+        self.amenities = {
+            amenity.id: amenity
+            for amenity in db.session.execute(
+                select(Amenity.id, Amenity.name, Amenity.owner_id).where(
+                    Amenity.id.in_(_ids(rows, "amenity_id"))
+                )
+            )
+        }
+        self.user_ids = set(
+            db.session.scalars(
+                select(User.id).where(User.id.in_(_ids(rows, "user_id")))
+            )
+        )
+        # Postgres rejects overlaps through its exclusion constraint, other
+        # databases are checked here against stored and earlier rows
+        self.check_overlaps = db.session.connection().dialect.name != "postgresql"
+        self.periods = defaultdict(list)
+
+    def validate(self, row):
+        amenity = self.amenities.get(_int(row, "amenity_id"))
+        if amenity is None:
+            raise ValueError(f"Unknown amenity_id {row['amenity_id']}")
+        if self.owner is not None and amenity.owner_id != self.owner.id:
+            raise ValueError(f"Amenity {amenity.id} is not yours")
+
+        user_id = _int(row, "user_id")
+        if user_id not in self.user_ids:
+            raise ValueError(f"Unknown user_id {user_id}")
+
+        start_time = _datetime(row, "start_time")
+        end_time = _datetime(row, "end_time")
+        if end_time <= start_time:
+            raise ValueError("end_time must be after start_time")
+
+        status = row.get("status") or "booked"
+        if status not in self.statuses:
+            raise ValueError(f"status must be one of {', '.join(self.statuses)}")
+
+        if status == "booked" and self.check_overlaps:
+            periods = self.periods[amenity.id]
+            if any(start < end_time and end > start_time for start, end in periods) or (
+                Booking.overlapping(amenity.id, start_time, end_time).first()
+            ):
+                raise ValueError("The amenity is already booked for this period")
+            periods.append((start_time, end_time))
+
+        return {
+            "user_id": user_id,
+            "amenity_id": amenity.id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "status": status,
+            "qr_code": generate_qr_code(qr_code_payload(amenity, start_time, end_time)),
+            "expires_at": start_time + timedelta(hours=1),
+        }
+
+    def export_query(self):
+        query = select(
+            Booking.id,
+            Booking.amenity_id,
+            Booking.user_id,
+            Booking.start_time,
+            Booking.end_time,
+            Booking.status,
+            Booking.expires_at,
+        ).order_by(Booking.id)
+        if self.owner is not None:
+            query = query.join(Amenity, Booking.amenity_id == Amenity.id).where(
+                Amenity.owner_id == self.owner.id
+            )
+        return query
+
+
+ENTITIES = {
+    "categories": CategoryBulk,
+    "amenities": AmenityBulk,
+    "bookings": BookingBulk,
+}
+
+
+def _copy_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def insert_rows(table, columns, values):
+    """Insert rows of `columns` in the current transaction, through COPY when
+    possible"""
+    connection = db.session.connection()
+    if (
+        connection.dialect.name == "postgresql"
+        and connection.dialect.driver == "psycopg2"
+    ):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in values:
+            writer.writerow([_copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        statement = (
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        )
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(statement, buffer)
+        except connection.dialect.loaded_dbapi.Error as e:
+            # Raised by the driver directly, wrap it as SQLAlchemy would
+            raise DBAPIError.instance(
+                statement, None, e, connection.dialect.loaded_dbapi.Error
+            ) from e
+        finally:
+            cursor.close()
+    else:
+        connection.execute(table.insert(), values)
+    mark_changed(db.session, table.name)
+
+
+def _write(entity, values):
+    """Insert the rows of an entity and run its follow-up writes"""
+    table = entity.model.__table__
+    insert_rows(table, entity.columns, values)
+    entity.inserted(db.session.connection(), values)
+
+
+def _error_message(error):
+    return str(error.orig).strip().splitlines()[0]
+
+
+def import_rows(entity, rows, chunk_size=1000, max_errors=1000):
+    """Validate and insert rows a chunk at a time, committing each chunk
+
+    Returns the number of inserted and failed rows with the errors of the first
+    `max_errors` failed rows, numbered from 1.
+    """
+    report = {"inserted": 0, "failed": 0, "errors": []}
+
+    def fail(number, message):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"row": number, "error": message})
+
+    numbered = enumerate(rows, 1)
+    while chunk := list(islice(numbered, chunk_size)):
+        entity.prepare([row for _, row in chunk if isinstance(row, dict)])
+        valid = []
+        for number, row in chunk:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                valid.append((number, entity.validate(row)))
+            except ValueError as e:
+                fail(number, str(e))
+
+        if not valid:
+            continue
+        try:
+            with db.session.begin_nested():
+                _write(entity, [values for _, values in valid])
+            report["inserted"] += len(valid)
+        except (IntegrityError, DataError):
+            for number, values in valid:
+                try:
+                    with db.session.begin_nested():
+                        _write(entity, [values])
+                    report["inserted"] += 1
+                except (IntegrityError, DataError) as e:
+                    fail(number, _error_message(e))
+        db.session.commit()
+
+    return report
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_rows(entity, fmt, batch_size=1000):
+    """Encoded rows of an entity, a batch per chunk, from a server-side cursor"""
+    result = db.session.execute(
+        entity.export_query().execution_options(yield_per=batch_size)
+    )
+    keys = list(result.keys())
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+        yield buffer.getvalue()
+
+    for rows in result.partitions():
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(dict(zip(keys, row)), default=_json_default) + "\n"
+                for row in rows
+            )
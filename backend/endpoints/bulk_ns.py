@@ -0,0 +1,79 @@
+import io
+
+from flask import (
+    Response,
+    current_app,
+    jsonify,
+    make_response,
+    request,
+    stream_with_context,
+)
+from flask_jwt_extended import current_user, jwt_required
+from flask_restx import Namespace, Resource
+
+from .bulk import ENTITIES, FORMATS, export_rows, import_rows, read_rows
+
+bulk_ns = Namespace(
+    "Bulk", description="Bulk import and export of categories, amenities and bookings"
+)
+
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def request_format():
+    """Format from the `format` argument, or else from the request mimetype"""
+    fmt = request.args.get("format")
+    if fmt is None:
+        fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+    if fmt not in FORMATS:
+        bulk_ns.abort(400, message=f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def bulk_entity(name):
+    """Entity of the current owner, amenities and bookings limited to theirs"""
+    if name not in ENTITIES:
+        bulk_ns.abort(404, message=f"Unknown entity {name!r}")
+    if not current_user.is_owner:
+        bulk_ns.abort(403, message="Only amenity owners can import and export")
+    return ENTITIES[name](owner=current_user)
+
+
+@bulk_ns.route("/<string:entity>")
+class BulkResource(Resource):
+    timeout_class = "bulk"
+
+    @jwt_required()
+    def get(self, entity):
+        """Export rows as NDJSON or CSV, streamed"""
+        fmt = request_format()
+        rows = export_rows(
+            bulk_entity(entity),
+            fmt,
+            batch_size=current_app.config.get("BULK_CHUNK_SIZE", 1000),
+        )
+        return Response(
+            stream_with_context(rows),
+            mimetype=MIMETYPES[fmt],
+            headers={"Content-Disposition": f"attachment; filename={entity}.{fmt}"},
+        )
+
+    @jwt_required()
+    def post(self, entity):
+        """Import rows from an NDJSON or CSV body or `file` upload
+
+        Valid rows are inserted a chunk at a time, the response reports the
+        rows that were rejected.
+        """
+        fmt = request_format()
+        target = bulk_entity(entity)
+        upload = request.files.get("file")
+        stream = upload.stream if upload else request.stream
+        report = import_rows(
+            target,
+            read_rows(io.TextIOWrapper(stream, encoding="utf-8-sig"), fmt),
+            chunk_size=current_app.config.get("BULK_CHUNK_SIZE", 1000),
+            max_errors=current_app.config.get("BULK_MAX_ERRORS", 1000),
+        )
+        status = 400 if report["failed"] and not report["inserted"] else 201
+        return make_response(jsonify(report), status)
@@ -0,0 +1,78 @@
+from datetime import timezone
+from functools import wraps
+from hashlib import blake2b
+
+from flask import Response, g, request
+from flask_restx.utils import unpack
+
+from models import TableVersion
+
+from .streaming import stream_format
+
+
+def table_versions(tables):
+    """(version, updated_at) of the given tables, read once per request"""
+    known = g.setdefault("table_versions", {})
+    missing = [table for table in tables if table not in known]
+    if missing:
+        known.update(TableVersion.current(missing))
+    return {table: known[table] for table in tables if table in known}
+
+
+def version_tag(versions):
+    """Weak ETag value of the table versions a response was built from"""
+    key = ";".join(
+        f"{name}={version}" for name, (version, _) in sorted(versions.items())
+    )
+    key += f";{request.full_path};{stream_format()}"
+    return blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def not_modified(tag, last_modified):
+    """Whether the request's validators match the current representation"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(tag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(*tables):
+    """Answer GETs of a resource built from `tables` with validators, and with
+    304 Not Modified when the client's copy is current
+
+    The check costs one primary key lookup of the table versions, the
+    resource itself only runs when the tables changed.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(tables)
+            if len(versions) < len(tables):
+                return func(*args, **kwargs)
+
+            tag = version_tag(versions)
+            last_modified = max(updated_at for _, updated_at in versions.values())
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+            headers = {
+                "ETag": f'W/"{tag}"',
+                "Last-Modified": last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+                "Cache-Control": "no-cache",
+            }
+            if not_modified(tag, last_modified):
+                return Response(status=304, headers=headers)
+
+            rv = func(*args, **kwargs)
+            if isinstance(rv, Response):
+                if rv.status_code == 200:
+                    rv.headers.update(headers)
+                return rv
+            data, code, extra = unpack(rv)
+            if code == 200:
+                extra = {**headers, **(extra or {})}
+            return data, code, extra
+
+        return wrapper
+
+    return decorator
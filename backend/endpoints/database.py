@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from exts import db
+
+logger = logging.getLogger(__name__)
+
+# Engines are created with a pool class that times every checkout, so worker
+# and connection counts can be sized from the wait times and saturation
+# counters in `app.extensions["db_pool"]` instead of by guesswork. Inside a
+# request each Postgres transaction gets a `SET LOCAL statement_timeout` for
+# the endpoint class, which is also safe behind PgBouncer in transaction mode.
+
+# Upper bounds in seconds of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolStats:
+    """Checkout counters of the connection pool of one worker"""
+
+    def __init__(self, slow_checkout=0.1):
+        self.slow_checkout = slow_checkout
+        self.pool_size = None
+        self.max_overflow = None
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.exhausted = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        # Objects with the same checked_out/checked_in/timed_out methods
+        self.observers = []
+        self._lock = threading.Lock()
+
+    def checked_out(self, wait, exhausted):
+        """Record a checkout, `exhausted` when all pooled connections were busy"""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait = max(self.max_wait, wait)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if wait <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            self.exhausted += exhausted
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        for observer in self.observers:
+            observer.checked_out(wait, exhausted)
+        if wait >= self.slow_checkout:
+            logger.warning("Waited %.3fs for a database connection", wait)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+        for observer in self.observers:
+            observer.checked_in()
+
+    def timed_out(self, wait):
+        with self._lock:
+            self.timeouts += 1
+        for observer in self.observers:
+            observer.timed_out(wait)
+        logger.error("Timed out after %.3fs waiting for a database connection", wait)
+
+    def snapshot(self):
+        """Counters as a dict, wait buckets cumulative like a histogram"""
+        with self._lock:
+            buckets, total = {}, 0
+            for bound, count in zip(WAIT_BUCKETS, self.wait_buckets):
+                total += count
+                buckets[bound] = total
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "wait_seconds": self.wait_seconds,
+                "max_wait": self.max_wait,
+                "wait_buckets": buckets,
+                "exhausted": self.exhausted,
+                "timeouts": self.timeouts,
+            }
+
+
+class TimedPool:
+    """Pool mixin recording checkouts in the `stats` of its class"""
+
+    stats = None
+
+    def connect(self):
+        exhausted = isinstance(self, QueuePool) and self.checkedout() >= self.size()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except sa_exc.TimeoutError:
+            self.stats.timed_out(time.perf_counter() - start)
+            raise
+        self.stats.checked_out(time.perf_counter() - start, exhausted)
+        return connection
+
+    def _do_return_conn(self, record):
+        self.stats.checked_in()
+        super()._do_return_conn(record)
+
+
+def timed_pool(poolclass, stats):
+    """Subclass of `poolclass` reporting to `stats`"""
+    return type(f"Timed{poolclass.__name__}", (TimedPool, poolclass), {"stats": stats})
+
+
+def statement_timeout():
+    """Statement timeout in ms for the endpoint class of the current request
+
+    Resources choose a class with a `timeout_class` attribute, otherwise safe
+    methods are "read" and the others "write".
+    """
+    view = current_app.view_functions.get(request.endpoint)
+    timeout_class = getattr(getattr(view, "view_class", None), "timeout_class", None)
+    if timeout_class is None:
+        safe = request.method in ("GET", "HEAD", "OPTIONS")
+        timeout_class = "read" if safe else "write"
+    return current_app.config.get("STATEMENT_TIMEOUTS", {}).get(timeout_class, 0)
+
+
+@event.listens_for(db.session, "after_begin")
+def set_statement_timeout(session, transaction, connection):
+    if connection.dialect.name != "postgresql" or not has_request_context():
+        return
+    timeout = statement_timeout()
+    if timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def instrument_pool(options, url, stats):
+    """Engine `options` for `url` with a pool class reporting to `stats`"""
+    options = dict(options)
+    url = make_url(url)
+    database = url.database or ":memory:"
+    in_memory = url.get_backend_name() == "sqlite" and database == ":memory:"
+    # Flask-SQLAlchemy picks a StaticPool for in-memory SQLite, leave it be
+    if "poolclass" in options or not in_memory:
+        poolclass = options.get("poolclass", QueuePool)
+        options["poolclass"] = timed_pool(poolclass, stats)
+        if issubclass(poolclass, QueuePool):
+            stats.pool_size = options.get("pool_size", 5)
+            stats.max_overflow = options.get("max_overflow", 10)
+    return options
+
+
+def init_db_pool(app):
+    """Instrument the engine pool, to be called before `db.init_app`"""
+    stats = PoolStats(slow_checkout=app.config.get("DB_POOL_SLOW_CHECKOUT", 0.1))
+    app.extensions["db_pool"] = stats
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = instrument_pool(
+        app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        stats,
+    )
+    return stats
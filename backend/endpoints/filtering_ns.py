@@ -1,15 +1,19 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from flask import jsonify, request
 from flask_restx import Namespace, Resource, fields
 from sqlalchemy import func
 
 from exts import db
-from models import Amenity, Booking, Category, Media, Review
+from models import Amenity, Booking, Category, Media, search_index
+
+from .response_cache import cached
+from .serializers import compile_model
+from .streaming import batch_size, stream_format, stream_response
 
 search_ns = Namespace(
     "Search",
-    description="Searches for amenities using categories, location, and booking status",
+    description="Searches for amenities using text, categories, location, and booking status",
 )
 
 # Amenity serialization Model
@@ -29,16 +33,40 @@ search_model = search_ns.model(
 )
 
 
+serialize_result = compile_model(search_model)
+
+
+def serialize_results(rows):
+    """Search result items of rows of the search query"""
+    return [serialize_result(row) for row in rows]
+
+
+def search_tables():
+    """Tables searches are built from, None for searches by booking date,
+    which depend on the unversioned bookings"""
+    if request.args.get("booking_date"):
+        return None
+    return ("amenities", "categories", "media", "reviews")
+
+
 # Define the search resource
 @search_ns.route("")
 class SearchResource(Resource):
-    @search_ns.marshal_with(search_model, as_list=True)
+    timeout_class = "search"
+
+    @search_ns.response(200, "Success", [search_model])
+    @cached("search", search_tables)
     def get(self):
+        q = request.args.get("q", "").strip()
         location = request.args.get("location")
         amenity_type = request.args.get("amenity_type")
         booking_date = request.args.get("booking_date")
 
         query = Amenity.query
+        order_by = Amenity.id
+
+        if q:
+            query, order_by = search_index.match(query, Amenity, q)
 
         if location:
             query = query.filter(Amenity.address.ilike(f"%{location}%"))
@@ -51,51 +79,47 @@ class SearchResource(Resource):
 
         if booking_date:
             try:
-                booking_date = datetime.strptime(booking_date, "%Y-%m-%d")
-                query = query.join(Amenity.bookings).filter(
-                    ~(
-                        (Booking.start_time <= booking_date)
-                        & (Booking.end_time >= booking_date)
-                    )
-                )
+                day_start = datetime.strptime(booking_date, "%Y-%m-%d")
             except ValueError:
                 return {"error": "Invalid date format. Use YYYY-MM-DD."}, 400
-
-        query = (
-            query.join(Amenity.category)
-            .outerjoin(Amenity.reviews)
-            .outerjoin(Amenity.images)
+            # Keep amenities without an active booking on that day
+            day_end = day_start + timedelta(days=1)
+            query = query.filter(
+                ~Amenity.bookings.any(
+                    (Booking.status == "booked")
+                    & (Booking.start_time < day_end)
+                    & (Booking.end_time > day_start)
+                )
+            )
+
+        # The first image is the cover, looked up per amenity so that the
+        # result has exactly one row per amenity
+        cover_image = (
+            db.select(func.coalesce(Media.card_url, Media.url))
+            .where(Media.amenity_id == Amenity.id)
+            .order_by(Media.id)
+            .limit(1)
+            .scalar_subquery()
         )
 
-        query = query.with_entities(
+        query = query.join(Amenity.category).with_entities(
             Amenity.id,
             Amenity.name,
             Amenity.description,
             Amenity.price_per_hour,
             Amenity.address,
             Category.name.label("category_name"),
-            func.avg(Review.rating).label("average_rating"),
-            func.count(Review.id).label("reviews_count"),
-            Media.url.label("image_url"),
+            Amenity.average_rating_expr().label("average_rating"),
+            Amenity.rating_count.label("reviews_count"),
+            cover_image.label("image_url"),
         )
 
-        query = query.group_by(Amenity.id, Category.name, Media.url)
-
-        amenities = query.all()
-
-        formatted_amenities = []
-        for amenity in amenities:
-            formatted_amenity = {
-                "id": amenity.id,
-                "name": amenity.name,
-                "description": amenity.description,
-                "price_per_hour": amenity.price_per_hour,
-                "address": amenity.address,
-                "category_name": amenity.category_name,
-                "average_rating": amenity.average_rating or 0.0,
-                "reviews_count": amenity.reviews_count,
-                "image_url": amenity.image_url or None,
-            }
-            formatted_amenities.append(formatted_amenity)
-
-        return formatted_amenities, 200
+        query = query.order_by(order_by)
+
+        fmt = stream_format()
+        if fmt:
+            return stream_response(
+                query.yield_per(batch_size()), serialize_results, fmt
+            )
+
+        return serialize_results(query.all()), 200
@@ -1,8 +1,35 @@
+import logging
 import os
-from datetime import datetime
+import tempfile
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from contextlib import ExitStack
 
 from flask import current_app
-from werkzeug.utils import secure_filename
+from PIL import Image, ImageOps
+
+from exts import db
+from models import Media
+
+from .jobs import task
+from .metrics import IMAGE_PROCESSING, IMAGES_PROCESSED, count, timed
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each variant produced from an upload
+IMAGE_VARIANTS = {"full": 1600, "card": 480, "thumb": 160}
+
+IMAGES_FOLDER = "amenities_images"
+
+_pool = None
+
+
+def _image_pool():
+    global _pool
+    if _pool is None:
+        workers = current_app.config.get("IMAGE_WORKERS") or None
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
 
 
 def allowed_file(filename):
@@ -10,26 +37,105 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def store_upload(file, folder):
+    """Stream an uploaded file into media storage under a name derived from
+    its content, so identical files share one name
+
+    The extension comes from the raw filename, which callers check with
+    `allowed_file`, as secure_filename may strip everything before it.
+    """
+    extension = os.path.splitext(file.filename)[1][1:].lower()
+    return get_storage().save_stream(folder, file.stream, extension)
+
+
 def save_image(file):
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        unique_filename = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        upload_folder = os.path.join(
-            current_app.root_path, "static", "amenities_images"
+        return store_upload(file, IMAGES_FOLDER)
+    return None
+
+
+def render_variants(src_path, dest_dir, stem):
+    """Decode an image once and write WebP and JPEG files for each variant
+
+    Runs in the image process pool, so it must not touch the app or session.
+    Each variant is downscaled from the previous, larger one.
+    """
+    variants = {}
+    with Image.open(src_path) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    for name, size in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        webp = f"{stem}_{name}.webp"
+        jpeg = f"{stem}_{name}.jpg"
+        image.save(os.path.join(dest_dir, webp), "WEBP", quality=80, method=4)
+        image.save(
+            os.path.join(dest_dir, jpeg),
+            "JPEG",
+            quality=82,
+            optimize=True,
+            progressive=True,
         )
-        os.makedirs(upload_folder, exist_ok=True)
+        variants[name] = {
+            "webp": webp,
+            "jpeg": jpeg,
+            "width": image.width,
+            "height": image.height,
+        }
+    return variants
 
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
 
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
-        return unique_filename
-    return None
+@task("process_images")
+def process_images(media_ids):
+    """Produce the resized variants of uploaded images in the process pool"""
+    storage = get_storage()
+    media = Media.query.filter(Media.id.in_(media_ids), Media.type == "image").all()
+
+    with timed(IMAGE_PROCESSING), ExitStack() as stack:
+        out_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        futures = {}
+        for item in media:
+            if not storage.exists(IMAGES_FOLDER, item.url):
+                continue
+            src_path = stack.enter_context(storage.local_copy(IMAGES_FOLDER, item.url))
+            stem = item.url.rsplit(".", 1)[0]
+            futures[item.id] = _image_pool().submit(
+                render_variants, src_path, out_dir, stem
+            )
+
+        processed = 0
+        for item in media:
+            if item.id not in futures:
+                continue
+            try:
+                variants = futures[item.id].result()
+            except BrokenExecutor:
+                raise
+            except Exception:
+                # An undecodable image keeps its original only, the others
+                # of the batch are still committed
+                logger.exception("Could not resize media %s (%s)", item.id, item.url)
+                continue
+            for variant in variants.values():
+                for fmt in ("webp", "jpeg"):
+                    storage.put_file(
+                        IMAGES_FOLDER, variant[fmt], os.path.join(out_dir, variant[fmt])
+                    )
+            item.variants = variants
+            item.card_url = variants["card"]["webp"]
+            processed += 1
+        count(IMAGES_PROCESSED, processed)
+    db.session.commit()
+
 
+@task("delete_image_file")
+def delete_image_file(file_path, variants=()):
+    # Content-addressed files may be shared by several media
+    if Media.query.filter_by(url=file_path).first():
+        return
 
-def delete_image_file(file_path):
-    upload_dir = os.path.join(current_app.root_path, "static", "amenities_images")
-    full_path = os.path.join(upload_dir, file_path)
-    if os.path.exists(full_path):
-        os.remove(full_path)
+    storage = get_storage()
+    for name in (file_path, *variants):
+        storage.delete(IMAGES_FOLDER, name)
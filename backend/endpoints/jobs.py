@@ -0,0 +1,145 @@
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from exts import db
+from models import Job
+
+from .transactions import on_commit
+
+logger = logging.getLogger(__name__)
+
+# Deferred work is stored in the jobs table and run by `flask jobs work`, so
+# request handlers only pay for an INSERT. Jobs are added to the current
+# session and committed together with the request's own changes.
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as a background task under the given name"""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name, run_at=None, max_attempts=5, **payload):
+    """Queue a task to run in the worker with the given keyword arguments"""
+    if name not in TASKS:
+        raise KeyError(f"Unknown task: {name}")
+
+    if current_app.config.get("JOBS_EAGER"):
+        # Run once the request has committed, as a worker would
+        on_commit(lambda: TASKS[name](**payload))
+        return None
+
+    job = Job(
+        name=name,
+        payload=payload,
+        run_at=run_at or datetime.utcnow(),
+        max_attempts=max_attempts,
+    )
+    db.session.add(job)
+    return job
+
+
+def claim_jobs(worker_id, batch_size):
+    """Mark up to batch_size due jobs as running for this worker"""
+    now = datetime.utcnow()
+    timeout = timedelta(seconds=current_app.config.get("JOBS_TIMEOUT", 300))
+
+    # Jobs of a worker that died or hung are picked up again, unless they
+    # used up their attempts
+    exhausted = Job.attempts >= Job.max_attempts
+    db.session.execute(
+        db.update(Job)
+        .where(Job.status == "running", Job.locked_at < now - timeout)
+        .values(
+            status=db.case((exhausted, "failed"), else_="queued"),
+            last_error=db.case(
+                (exhausted, f"Timed out after {timeout.total_seconds():g}s"),
+                else_=Job.last_error,
+            ),
+            locked_by=None,
+            locked_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    due = (
+        db.select(Job.id)
+        .where(Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.run_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id.in_(due), Job.status == "queued")
+        .values(
+            status="running",
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=Job.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return Job.query.filter_by(status="running", locked_by=worker_id).all()
+
+
+def run_job(job):
+    """Run a claimed job, scheduling a retry with backoff when it fails"""
+    try:
+        TASKS[job.name](**job.payload)
+    except Exception:
+        db.session.rollback()
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            logger.error("Job %s (%s) failed: %s", job.id, job.name, job.last_error)
+        else:
+            job.status = "queued"
+            job.run_at = datetime.utcnow() + timedelta(seconds=2**job.attempts)
+    else:
+        job.status = "done"
+        job.last_error = None
+    job.locked_by = None
+    job.locked_at = None
+    db.session.commit()
+
+
+def purge_jobs(older_than):
+    """Delete finished jobs older than the given timedelta"""
+    db.session.execute(
+        db.delete(Job).where(
+            Job.status == "done", Job.created_at < datetime.utcnow() - older_than
+        )
+    )
+    db.session.commit()
+
+
+def work(batch_size=50, poll_interval=1.0, burst=False):
+    """Run queued jobs until interrupted, or until the queue is empty in
+    burst mode"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while True:
+        jobs = claim_jobs(worker_id, batch_size)
+        for job in jobs:
+            run_job(job)
+        processed += len(jobs)
+
+        if not jobs:
+            if burst:
+                return processed
+            time.sleep(poll_interval)
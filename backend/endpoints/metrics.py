@@ -0,0 +1,263 @@
+import atexit
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, current_app, g, has_app_context, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from exts import db
+from models import Booking
+
+from .database import WAIT_BUCKETS
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Prometheus metrics served at /metrics: request latency per namespace and
+# resource, requests in flight, connection pool checkouts, QR code and image
+# processing times and bookings created and canceled. Under gunicorn with
+# several workers, PROMETHEUS_MULTIPROC_DIR must name an empty directory,
+# where each worker writes its values and from which a scrape of any worker
+# aggregates them (see gunicorn.conf.py). Without it, a scrape only reports
+# the worker serving it. Images and QR codes are mostly processed by
+# `flask jobs work`, which writes to the same directory when it shares it, or
+# else serves its own metrics on METRICS_PORT. Metrics are off by default, and
+# with METRICS_TOKEN set /metrics requires it as a bearer token.
+
+# Upper bounds in seconds of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds",
+        "Time spent serving requests",
+        ["namespace", "resource", "method", "status"],
+        buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS_IN_FLIGHT = Gauge(
+        "http_requests_in_flight",
+        "Requests being served",
+        multiprocess_mode="livesum",
+    )
+    POOL_SIZE = Gauge(
+        "db_pool_size",
+        "Connections kept by the pools",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    POOL_IN_USE = Gauge(
+        "db_pool_connections_in_use",
+        "Connections checked out of the pools",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    POOL_WAIT = Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time waited for a connection",
+        ["pool"],
+        buckets=WAIT_BUCKETS,
+    )
+    POOL_EXHAUSTED = Counter(
+        "db_pool_exhausted",
+        "Checkouts made while every pooled connection was busy",
+        ["pool"],
+    )
+    POOL_TIMEOUTS = Counter(
+        "db_pool_timeouts", "Checkouts that timed out waiting", ["pool"]
+    )
+    QR_RENDER = Histogram(
+        "qr_code_render_seconds", "Time spent rendering QR codes", ["format"]
+    )
+    IMAGE_PROCESSING = Histogram(
+        "image_processing_seconds",
+        "Time spent producing the variants of a batch of images",
+        buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    )
+    IMAGES_PROCESSED = Counter("images_processed", "Images resized into variants")
+    BOOKINGS_CREATED = Counter("bookings_created", "Bookings committed")
+    BOOKINGS_CANCELED = Counter("bookings_canceled", "Bookings canceled or deleted")
+else:
+    QR_RENDER = IMAGE_PROCESSING = IMAGES_PROCESSED = None
+    BOOKINGS_CREATED = BOOKINGS_CANCELED = None
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block in `histogram`, if metrics are on"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if histogram is not None:
+            if labels:
+                histogram = histogram.labels(**labels)
+            histogram.observe(time.perf_counter() - start)
+
+
+def count(counter, amount=1):
+    """Increment `counter`, if metrics are on"""
+    if counter is not None:
+        counter.inc(amount)
+
+
+class PoolMetrics:
+    """Observer of a PoolStats reporting to the pool metrics"""
+
+    def __init__(self, pool, stats):
+        self.pool = pool
+        self.in_use = POOL_IN_USE.labels(pool)
+        self.wait = POOL_WAIT.labels(pool)
+        self.exhausted = POOL_EXHAUSTED.labels(pool)
+        self.timeouts = POOL_TIMEOUTS.labels(pool)
+        if stats.pool_size is not None:
+            POOL_SIZE.labels(pool).set(stats.pool_size)
+
+    def checked_out(self, wait, exhausted):
+        self.in_use.inc()
+        self.wait.observe(wait)
+        if exhausted:
+            self.exhausted.inc()
+
+    def checked_in(self):
+        self.in_use.dec()
+
+    def timed_out(self, wait):
+        self.timeouts.inc()
+
+
+def request_labels():
+    """Namespace and resource of the current request
+
+    The namespace is the first segment after /api/ of the matched rule, the
+    resource the restx resource class or else the endpoint.
+    """
+    if request.url_rule is None:
+        return "", "none"
+    parts = request.url_rule.rule.split("/")
+    namespace = parts[2] if len(parts) > 2 and parts[1] == "api" else ""
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, "view_class", None)
+    return namespace, view_class.__name__ if view_class else request.endpoint
+
+
+def _mark_booking(session, name):
+    if session is not None:
+        events = session.info.setdefault("booking_events", [])
+        events.append(name)
+
+
+@event.listens_for(Booking, "after_insert")
+def booking_created(mapper, connection, target):
+    _mark_booking(object_session(target), "created")
+
+
+@event.listens_for(Booking, "after_update")
+def booking_updated(mapper, connection, target):
+    if "canceled" in inspect(target).attrs.status.history.added:
+        _mark_booking(object_session(target), "canceled")
+
+
+@event.listens_for(Booking, "after_delete")
+def booking_deleted(mapper, connection, target):
+    _mark_booking(object_session(target), "canceled")
+
+
+@event.listens_for(db.session, "after_commit")
+def count_bookings(session):
+    # Savepoints are left to the outer transaction
+    if session.in_nested_transaction() or prometheus_client is None:
+        return
+    events = session.info.pop("booking_events", ())
+    if events and has_app_context() and "metrics" in current_app.extensions:
+        count(BOOKINGS_CREATED, events.count("created"))
+        count(BOOKINGS_CANCELED, events.count("canceled"))
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def discard_bookings(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("booking_events", None)
+
+
+def metrics_view():
+    """Metrics of every worker in the Prometheus text format"""
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        abort(401)
+    registry = prometheus_client.REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(
+        prometheus_client.generate_latest(registry),
+        mimetype=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+def init_metrics(app):
+    """Record request and pool metrics and serve them at METRICS_PATH, to be
+    called after the pools are instrumented and before the other request hooks
+    so that their time is measured too"""
+    if not app.config.get("METRICS", False):
+        return None
+    if prometheus_client is None:
+        raise RuntimeError("Metrics require prometheus_client")
+
+    pools = {"primary": app.extensions["db_pool"]}
+    pools.update(
+        (replica.key, replica.stats) for replica in app.extensions.get("replicas", ())
+    )
+    for pool, stats in pools.items():
+        stats.observers.append(PoolMetrics(pool, stats))
+
+    path = app.config.get("METRICS_PATH", "/metrics")
+    app.add_url_rule(path, "metrics", metrics_view)
+
+    @app.before_request
+    def start_request():
+        if request.path != path:
+            g.metrics_started = time.perf_counter()
+            REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            namespace, resource = request_labels()
+            REQUEST_LATENCY.labels(
+                namespace, resource, request.method, str(response.status_code)
+            ).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        if g.pop("metrics_started", None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
+
+    app.extensions["metrics"] = pools
+    return pools
+
+
+def init_worker_metrics(app):
+    """Export the metrics of a job worker, which serves no requests
+
+    With PROMETHEUS_MULTIPROC_DIR they are written there and scraped from the
+    web workers, the live gauges of the worker being dropped when it exits.
+    Otherwise they are served on METRICS_PORT, if set.
+    """
+    if "metrics" not in app.extensions:
+        return
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        atexit.register(multiprocess.mark_process_dead, os.getpid())
+    elif app.config.get("METRICS_PORT"):
+        prometheus_client.start_http_server(
+            app.config["METRICS_PORT"], addr=app.config.get("METRICS_HOST", "127.0.0.1")
+        )
@@ -0,0 +1,34 @@
+from urllib.parse import urlencode
+
+from flask import current_app, request
+
+
+def page_args():
+    """Read the keyset pagination `limit` and `after` query parameters"""
+    default = current_app.config.get("PAGE_SIZE", 50)
+    maximum = current_app.config.get("MAX_PAGE_SIZE", 200)
+
+    limit = request.args.get("limit", default, type=int)
+    limit = max(1, min(limit, maximum))
+    after = request.args.get("after", type=int)
+    return limit, after
+
+
+def next_page_headers(rows, limit, key):
+    """Trim the look-ahead row and build the headers pointing at the next page
+
+    Callers fetch `limit + 1` rows so the presence of a next page is known
+    without a separate COUNT query.
+    """
+    if len(rows) <= limit:
+        return rows, {}
+
+    rows = rows[:limit]
+    cursor = key(rows[-1])
+    args = request.args.to_dict()
+    args.update(after=cursor, limit=limit)
+    headers = {
+        "X-Next-Cursor": str(cursor),
+        "Link": f'<{request.base_url}?{urlencode(args)}>; rel="next"',
+    }
+    return rows, headers
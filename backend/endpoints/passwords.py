@@ -0,0 +1,100 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Password hashing runs on a small dedicated thread pool. hashlib releases the
+# GIL while hashing, so the pool bounds how many CPU cores hashing can take,
+# and requests beyond PASSWORD_HASH_QUEUE waiting hashes are turned away
+# instead of piling up behind a login burst.
+
+
+class HasherBusy(Exception):
+    """Raised when too many password hashes are already pending, or when a
+    hash waited longer than PASSWORD_HASH_TIMEOUT"""
+
+
+_hasher_lock = threading.Lock()
+
+
+class PasswordHasher:
+    def __init__(self, method, workers, queue_size, timeout):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._prefix = None
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether a stored hash uses another method or cost than configured"""
+        if self._prefix is None:
+            # Werkzeug fills in default parameters, compare against its output
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._prefix
+
+
+def _hasher():
+    hasher = current_app.extensions.get("password_hasher")
+    if hasher is None:
+        # Concurrent first requests must share one executor
+        with _hasher_lock:
+            hasher = current_app.extensions.get("password_hasher")
+            if hasher is None:
+                hasher = PasswordHasher(
+                    method=current_app.config.get("PASSWORD_HASH_METHOD", "scrypt"),
+                    workers=current_app.config.get("PASSWORD_HASH_WORKERS", 2),
+                    queue_size=current_app.config.get("PASSWORD_HASH_QUEUE", 16),
+                    timeout=current_app.config.get("PASSWORD_HASH_TIMEOUT", 10),
+                )
+                current_app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def hash_password(password):
+    """Hash a password with the configured method and cost"""
+    return _hasher().hash(password)
+
+
+def verify_password(user, password):
+    """Check a password against a user's hash, upgrading the stored hash when
+    the configured method or cost has changed
+
+    The upgraded hash is set on the user and committed with the request. It
+    is left for a later login when the hasher is busy.
+    """
+    hasher = _hasher()
+    if not hasher.verify(user.password, password):
+        return False
+    if hasher.needs_rehash(user.password):
+        try:
+            user.password = hasher.hash(password)
+        except HasherBusy:
+            logger.warning("Hasher busy, password of user %s not rehashed", user.id)
+    return True
@@ -0,0 +1,122 @@
+import json
+import logging
+import random
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# With SQL_PROFILER set, a sample of SQL_PROFILER_SAMPLE_RATE of the requests
+# count the statements they run and the time spent in the database, on the
+# primary and the replicas alike. Statements are grouped by their SQL, which
+# is parameterized, so a statement run SQL_PROFILER_REPEAT_THRESHOLD times or
+# more in one request is reported as a likely N+1. Profiled responses get a
+# Server-Timing header and the summary is logged as JSON, at warning level
+# when statements repeat. Statements run while a streamed body is sent come
+# after the response and are not counted.
+
+
+class Profile:
+    """Statements run by one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        stats = self.statements.setdefault(statement, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+
+    def repeated(self, threshold):
+        """Statements run at least `threshold` times, most frequent first"""
+        repeated = [
+            {
+                "statement": " ".join(statement.split()),
+                "count": count,
+                "ms": round(seconds * 1000, 2),
+            }
+            for statement, (count, seconds) in self.statements.items()
+            if count >= threshold
+        ]
+        return sorted(repeated, key=lambda item: -item["count"])
+
+
+def _profile():
+    return g.get("sql_profile") if has_request_context() else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile()
+    started = conn.info.get("profile_started")
+    if profile is not None and started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+
+def handle_error(exception_context):
+    connection = exception_context.connection
+    started = connection.info.get("profile_started") if connection else None
+    if started:
+        started.pop()
+
+
+def server_timing(profile, elapsed):
+    """Server-Timing value of a profiled request"""
+    return (
+        f'db;dur={profile.seconds * 1000:.2f};desc="{profile.count} queries", '
+        f"app;dur={elapsed * 1000:.2f}"
+    )
+
+
+def init_profiler(app):
+    """Profile the SQL of sampled requests, to be called before the other
+    request hooks so that their statements are counted too"""
+    if not app.config.get("SQL_PROFILER", False):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+
+    @app.before_request
+    def start_profile():
+        if random.random() < current_app.config.get("SQL_PROFILER_SAMPLE_RATE", 1.0):
+            g.sql_profile = Profile()
+
+    @app.after_request
+    def end_profile(response):
+        profile = g.pop("sql_profile", None)
+        if profile is None:
+            return response
+
+        elapsed = time.perf_counter() - profile.started
+        response.headers["Server-Timing"] = server_timing(profile, elapsed)
+        repeated = profile.repeated(
+            current_app.config.get("SQL_PROFILER_REPEAT_THRESHOLD", 5)
+        )
+        summary = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 2),
+            "queries": profile.count,
+            "db_ms": round(profile.seconds * 1000, 2),
+            "repeated": repeated,
+        }
+        level = logging.WARNING if repeated else logging.INFO
+        logger.log(level, "SQL profile %s", json.dumps(summary))
+        return response
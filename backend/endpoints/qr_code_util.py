@@ -1,40 +1,92 @@
+import hashlib
+import hmac
+import io
 import os
-from datetime import datetime
 
 import qrcode
+import qrcode.image.svg
 from flask import current_app
 
+from .cache import LRUCache
+from .jobs import task
+from .metrics import QR_RENDER, timed
+from .storage import get_storage
+
+# Rendered codes are content addressed: the key is an HMAC of the payload, so
+# identical bookings share an image and keys cannot be guessed from a booking.
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+QR_FOLDER = "bookings_qr"
+
+_cache = None
+
+
+def _qr_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(maxsize=current_app.config.get("QR_CACHE_SIZE", 256))
+    return _cache
+
 
 def generate_qr_code(data: str) -> str:
-    """Generate a QR code from the given data"""
-    upload_dir = os.path.join(current_app.root_path, "static", "bookings_qr")
-    os.makedirs(upload_dir, exist_ok=True)
+    """Return the key of the QR code for the given data
 
-    # Generate QR code
-    qr_image = qrcode.make(data)
+    Nothing is rendered here, the image is produced by `render_qr_code` the
+    first time it is requested.
+    """
+    secret = current_app.config["SECRET_KEY"].encode()
+    return hmac.new(secret, data.encode(), hashlib.sha256).hexdigest()[:32]
 
-    # Create unique filename using timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"qr_{timestamp}.png"
 
-    # Create the full file path
-    file_path = os.path.join(upload_dir, filename)
+def render_qr_code(key: str, fmt: str, data=None):
+    """Return the QR code image stored under key, rendering it from data if
+    neither the memory nor the storage tier has it
 
-    # Save the QR code image
-    qr_image.save(file_path)
+    Returns None when the image is not cached and no data was given.
+    """
+    cache = _qr_cache()
+    image = cache.get((key, fmt))
+    if image is not None:
+        return image
 
-    # Return the relative path that can be stored in the database
-    return os.path.join(filename)
+    storage = get_storage()
+    image = storage.read_bytes(QR_FOLDER, f"{key}.{fmt}")
+    if image is None:
+        if data is None:
+            return None
+        image = _render(data, fmt)
+        storage.put_bytes(QR_FOLDER, f"{key}.{fmt}", image)
 
+    cache.set((key, fmt), image)
+    return image
 
-def delete_qr_code(filename: str) -> bool:
-    """Delete the QR code image with the given filename"""
 
-    file_path = os.path.join(current_app.root_path, filename.lstrip("/"))
+@task("warm_qr_code")
+def warm_qr_code(key, data, fmt="svg"):
+    """Render a QR code ahead of its first request"""
+    render_qr_code(key, fmt, data)
 
-    # Check if the file exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        return True
-    else:
+
+def _render(data, fmt):
+    with timed(QR_RENDER, format=fmt):
+        if fmt == "svg":
+            # Vector output skips rasterizing and PNG compression altogether
+            image = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage)
+            return image.to_string()
+
+        buffer = io.BytesIO()
+        qrcode.make(data).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+@task("delete_qr_code")
+def delete_qr_code(key: str) -> bool:
+    """Delete every cached rendering of the QR code with the given key"""
+    if not key:
         return False
+
+    key = os.path.basename(key).rsplit(".", 1)[0]
+    deleted = False
+    for fmt in QR_FORMATS:
+        _qr_cache().delete((key, fmt))
+        deleted = get_storage().delete(QR_FOLDER, f"{key}.{fmt}") or deleted
+    return deleted
@@ -0,0 +1,169 @@
+import logging
+import random
+import threading
+import time
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+
+from exts import db
+
+from .database import PoolStats, instrument_pool
+
+logger = logging.getLogger(__name__)
+
+# GET and HEAD requests read from a random replica in DATABASE_REPLICA_URLS
+# whose replication lag is within REPLICA_MAX_LAG seconds, or from the primary
+# when none is. Successful writes of an authenticated user keep that user on
+# the primary for REPLICA_STICKY_SECONDS so they read their own writes. This
+# is recorded by JWT identity in a store shared by the workers, Redis or with
+# REPLICA_STICKY_STORE=memory a dict of the process, since the cross-origin
+# frontend sends no cookies. Resources that must always see the primary set
+# `use_primary = True`.
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Seconds the replica is behind, 0 when it has replayed everything received
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+        "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+class Replica:
+    """Read replica bound as `key` whose lag is measured at most every interval"""
+
+    def __init__(self, key, stats):
+        self.key = key
+        self.stats = stats
+        self._lag = 0.0
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        return db.engines[self.key]
+
+    def lag(self, interval):
+        # One thread measures, the others use the last value meanwhile
+        if time.monotonic() - self._checked >= interval and self._lock.acquire(
+            blocking=False
+        ):
+            try:
+                self._lag = self._measure()
+                self._checked = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._lag
+
+    def _measure(self):
+        query = LAG_QUERIES.get(self.engine.dialect.name)
+        if query is None:
+            return 0.0
+        try:
+            with self.engine.connect() as connection:
+                lag = connection.exec_driver_sql(query).scalar()
+        except Exception:
+            logger.warning("Replica %s is unreachable", self.key, exc_info=True)
+            return float("inf")
+        return float(lag or 0)
+
+
+class RedisStickyStore:
+    """Users on the primary as Redis keys expiring with their stickiness"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis sticky store requires redis-py") from e
+
+        self.client = redis.Redis.from_url(url)
+
+    def stick(self, identity, seconds):
+        self.client.set(f"db-primary:{identity}", 1, ex=max(1, int(seconds)))
+
+    def is_sticky(self, identity):
+        return bool(self.client.exists(f"db-primary:{identity}"))
+
+
+class MemoryStickyStore:
+    """Users on the primary in a dict of this process, for single workers"""
+
+    def __init__(self):
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def stick(self, identity, seconds):
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for key, until in self._until.items() if until <= now]
+            for key in expired:
+                del self._until[key]
+            self._until[identity] = now + seconds
+
+    def is_sticky(self, identity):
+        return self._until.get(identity, 0) > time.monotonic()
+
+
+def request_identity():
+    """JWT identity of the request, None when it has no valid access token"""
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return get_jwt_identity()
+
+
+def init_replicas(app):
+    """Bind the replica engines and route reads, to be called before `db.init_app`"""
+    urls = [url for url in app.config.get("DATABASE_REPLICA_URLS", []) if url]
+    replicas = []
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for i, url in enumerate(urls, 1):
+        key = f"replica_{i}"
+        stats = PoolStats(slow_checkout=app.config.get("DB_POOL_SLOW_CHECKOUT", 0.1))
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        binds[key] = {"url": url, **instrument_pool(options, url, stats)}
+        replicas.append(Replica(key, stats))
+    app.extensions["replicas"] = replicas
+    if not replicas:
+        return replicas
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+    max_lag = app.config.get("REPLICA_MAX_LAG", 5)
+    interval = app.config.get("REPLICA_LAG_CHECK_INTERVAL", 2)
+    sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 10)
+    if app.config.get("REPLICA_STICKY_STORE", "redis") == "memory":
+        sticky = MemoryStickyStore()
+    else:
+        sticky = RedisStickyStore(app.config["REDIS_URL"])
+    app.extensions["replica_sticky"] = sticky
+
+    @app.before_request
+    def route_reads():
+        if request.method not in ("GET", "HEAD"):
+            return
+        identity = request_identity()
+        if identity is not None and sticky.is_sticky(identity):
+            return
+        view = app.view_functions.get(request.endpoint)
+        if getattr(getattr(view, "view_class", None), "use_primary", False):
+            return
+        healthy = [replica for replica in replicas if replica.lag(interval) <= max_lag]
+        if healthy:
+            db.session.info["replica"] = random.choice(healthy).engine
+
+    @app.after_request
+    def stick_to_primary(response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            identity = request_identity()
+            if identity is not None:
+                sticky.stick(identity, sticky_seconds)
+        return response
+
+    return replicas
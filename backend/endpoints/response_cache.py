@@ -0,0 +1,135 @@
+import json
+from functools import wraps
+
+from flask import Response, current_app, request
+from flask_restx.utils import unpack
+
+from .cache import LRUCache
+from .conditional import table_versions
+from .streaming import stream_format
+
+# Category lists, amenity details and search results are cached per worker,
+# and in Redis with the redis backend. Each response is keyed by the versions
+# of the tables it is built from, read from `table_versions`, which every
+# transaction writing to those tables bumps before it commits, whichever
+# process runs it. A read after a committed write therefore misses the
+# entries computed before it, in every worker and with either backend.
+
+
+class MemoryCacheBackend:
+    """Values only in the worker LRU"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+
+class RedisCacheBackend:
+    """Values in Redis, shared by all workers"""
+
+    def __init__(self, url, prefix="response-cache"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis response cache requires redis-py") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(f"{self.prefix}:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(f"{self.prefix}:{key}", json.dumps(value), ex=max(1, int(ttl)))
+
+
+class ResponseCache:
+    """Worker LRU of responses in front of the backend of the app"""
+
+    def __init__(self, backend, maxsize, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, name, tables, params):
+        """Key of a response built from `tables`, None if they aren't versioned"""
+        versions = table_versions(tables)
+        if len(versions) < len(tables):
+            return None
+        versions = ",".join(f"{table}={versions[table][0]}" for table in tables)
+        return f"{name}:{params}:{versions}"
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self.backend.set(key, value, self.ttl)
+
+
+def _request_params(kwargs):
+    args = sorted(request.args.items(multi=True))
+    return json.dumps([sorted(kwargs.items()), args], default=str)
+
+
+def cached(name, tables):
+    """Cache the successful responses of a GET resource method
+
+    `tables` are the versioned tables the response is built from, or a
+    function of the view arguments returning them, or None for a response
+    that must not be cached. Streamed responses are not cached.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get("response_cache")
+            if cache is None or stream_format():
+                return func(*args, **kwargs)
+
+            depends = tables(**kwargs) if callable(tables) else tables
+            key = depends and cache.key(name, sorted(depends), _request_params(kwargs))
+            if not key:
+                return func(*args, **kwargs)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit["data"], 200, hit["headers"]
+
+            rv = func(*args, **kwargs)
+            if isinstance(rv, Response):
+                return rv
+            data, code, headers = unpack(rv)
+            if code == 200:
+                cache.set(key, {"data": data, "headers": dict(headers or {})})
+            return rv
+
+        return wrapper
+
+    return decorator
+
+
+def init_response_cache(app):
+    """Create the response cache of the app, disabled with RESPONSE_CACHE=none"""
+    backend = app.config.get("RESPONSE_CACHE", "memory")
+    if backend == "none":
+        return None
+    if backend == "redis":
+        backend = RedisCacheBackend(app.config["REDIS_URL"])
+    else:
+        backend = MemoryCacheBackend()
+
+    cache = ResponseCache(
+        backend,
+        maxsize=app.config.get("RESPONSE_CACHE_SIZE", 1024),
+        ttl=app.config.get("RESPONSE_CACHE_TTL", 30),
+    )
+    app.extensions["response_cache"] = cache
+    return cache
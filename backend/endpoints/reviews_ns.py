@@ -2,7 +2,10 @@ from flask import jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_restx import Namespace, Resource, fields
 
-from models import Amenity, Review
+from exts import db
+from models import Amenity, Review, User
+
+from .serializers import compile_model
 
 reviews_ns = Namespace("Reviews", description="Reviews management")
 
@@ -18,11 +21,25 @@ review_model = reviews_ns.model(
     },
 )
 
+# Reviews of an amenity, with the username of their author
+review_item_model = reviews_ns.model(
+    "ReviewItem",
+    {
+        "user_id": fields.Integer(),
+        "username": fields.String(),
+        "rating": fields.Integer(),
+        "comment": fields.String(),
+    },
+)
+
+serialize_review = compile_model(review_model)
+serialize_review_item = compile_model(review_item_model, args=("username",))
+
 
 @reviews_ns.route("")
 class ReviewListResource(Resource):
     @jwt_required()
-    @reviews_ns.marshal_with(review_model)
+    @reviews_ns.response(201, "Created", review_model)
     def post(self):
         """Create a new review"""
         user_id = get_jwt_identity()
@@ -49,30 +66,29 @@ class ReviewListResource(Resource):
             comment=data["comment"],
         )
         new_review.save()
-        return new_review, 201
+        return serialize_review(new_review), 201
 
 
 @reviews_ns.route("/amenity/<int:amenity_id>")
 class AmenityReviewsResource(Resource):
+    @reviews_ns.response(200, "Success", [review_item_model])
     def get(self, amenity_id):
         """Get all reviews for a specific amenity"""
         # Verify amenity exists
         Amenity.query.get_or_404(amenity_id)
 
-        reviews = Review.query.filter_by(amenity_id=amenity_id).all()
+        reviews = (
+            db.session.query(Review, User.username)
+            .join(User, Review.user_id == User.id)
+            .filter(Review.amenity_id == amenity_id)
+            .order_by(Review.id)
+            .all()
+        )
         if not reviews:
             return make_response(
                 jsonify({"message": "No reviews found for this amenity"}), 404
             )
 
-        review_response = [
-            {
-                "user_id": review.user_id,
-                "username": review.user.username,
-                "rating": review.rating,
-                "comment": review.comment,
-            }
-            for review in reviews
-        ]
-
-        return review_response, 200
+        return [
+            serialize_review_item(review, username) for review, username in reviews
+        ], 200
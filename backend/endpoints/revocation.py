@@ -0,0 +1,162 @@
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+from exts import db
+from models import RevokedToken
+
+from .cache import LRUCache
+
+# Revoked JWTs live in a store shared by all workers. Entries expire with
+# their token, so the store only holds tokens that could still be presented.
+# Every worker keeps an LRU of lookups in front of the store: revocations are
+# cached until the token expires, non-revocations for REVOCATION_CACHE_TTL
+# seconds, which bounds how long another worker's logout can go unnoticed.
+# Resources raise JWT errors, revoked tokens included, through flask-restx,
+# which would answer them with a 500: the Api hands them to the JWT manager.
+
+
+class DatabaseRevocationStore:
+    """Revocations in the revoked_tokens table, committed with the request"""
+
+    def revoke(self, jti, expires):
+        db.session.merge(
+            RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires))
+        )
+
+    def is_revoked(self, jti):
+        return db.session.get(RevokedToken, jti) is not None
+
+    def purge(self):
+        result = db.session.execute(
+            db.delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+class RedisRevocationStore:
+    """Revocations as Redis keys expiring with their token"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis revocation store requires redis-py") from e
+
+        self.client = redis.Redis.from_url(url)
+
+    def revoke(self, jti, expires):
+        ttl = max(1, int(expires - time.time()))
+        self.client.set(f"revoked:{jti}", 1, ex=ttl)
+
+    def is_revoked(self, jti):
+        return bool(self.client.exists(f"revoked:{jti}"))
+
+    def purge(self):
+        return 0
+
+
+class MemoryRevocationStore:
+    """Revocations in a dict of this process, for tests and single workers"""
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires):
+        with self._lock:
+            self._revoked[jti] = expires
+
+    def is_revoked(self, jti):
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires in self._revoked.items() if expires <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+
+class TokenRevocation:
+    """Revocation store of the app with a per-worker lookup cache"""
+
+    def __init__(self, store, cache_size, cache_ttl):
+        self.store = store
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def revoke(self, jti, expires):
+        self.store.revoke(jti, expires)
+        self.cache.set(jti, True, ttl=max(0, expires - time.time()))
+
+    def is_revoked(self, jti, expires):
+        revoked = self.cache.get(jti)
+        if revoked is None:
+            revoked = self.store.is_revoked(jti)
+            if revoked:
+                self.cache.set(jti, True, ttl=max(0, expires - time.time()))
+            else:
+                self.cache.set(jti, False)
+        return revoked
+
+
+def init_revocation(app, jwt):
+    """Create the revocation store of the app and register it with the JWT
+    manager so every @jwt_required() call consults it"""
+    backend = app.config.get("REVOCATION_STORE", "database")
+    if backend == "redis":
+        store = RedisRevocationStore(app.config["REDIS_URL"])
+    elif backend == "memory":
+        store = MemoryRevocationStore()
+    else:
+        store = DatabaseRevocationStore()
+
+    revocation = TokenRevocation(
+        store,
+        cache_size=app.config.get("REVOCATION_CACHE_SIZE", 10000),
+        cache_ttl=app.config.get("REVOCATION_CACHE_TTL", 5),
+    )
+    app.extensions["token_revocation"] = revocation
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        return revocation.is_revoked(jwt_payload["jti"], jwt_payload["exp"])
+
+    return revocation
+
+
+def revoke_token(jwt_payload):
+    """Revoke a decoded token until it expires"""
+    revocation = current_app.extensions["token_revocation"]
+    revocation.revoke(jwt_payload["jti"], jwt_payload["exp"])
+
+
+def jwt_error(error):
+    """Answer a JWT error the way the JWT manager does, 401 for missing,
+    expired and revoked tokens and unknown users"""
+    # The JWT manager registers its handlers on the app, which flask-restx
+    # bypasses. Look them up as Flask does, by the classes of the error
+    handlers = current_app.error_handler_spec[None][None]
+    for cls in type(error).__mro__:
+        if cls in handlers:
+            response = current_app.make_response(handlers[cls](error))
+            data = response.get_json()
+            # Rather than the text of the error, which flask-restx would add
+            data.setdefault(
+                "message", data[current_app.config["JWT_ERROR_MESSAGE_KEY"]]
+            )
+            return data, response.status_code
+    raise error
+
+
+def init_jwt_errors(api):
+    """Register the JWT error responses on the restx Api"""
+    api.errorhandler(JWTExtendedException)(jwt_error)
+    api.errorhandler(PyJWTError)(jwt_error)
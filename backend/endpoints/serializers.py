@@ -0,0 +1,119 @@
+from flask import current_app, make_response
+from flask.json.provider import DefaultJSONProvider
+from flask_restx import fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Responses are serialized by functions compiled once per restx model, which
+# read each attribute and convert it inline instead of walking the field
+# objects of the model for every row as `marshal` does. The result is encoded
+# with orjson when it is installed, or else with the json module.
+
+
+class Timestamp(fields.Raw):
+    """Naive datetime formatted as YYYY-MM-DD HH:MM:SS"""
+
+    __schema_type__ = "string"
+
+    def format(self, value):
+        return value.isoformat(" ", "seconds")
+
+
+# Field classes converted inline, by the expression formatting a value `v`
+CONVERSIONS = {
+    fields.Integer: "int(v)",
+    fields.Float: "float(v)",
+    fields.String: "str(v)",
+    fields.DateTime: "v.isoformat()",
+    fields.Raw: "v",
+    Timestamp: 'v.isoformat(" ", "seconds")',
+}
+
+
+def _default_value(field):
+    default = field._v("default")
+    return field.format(default) if default else default
+
+
+def compile_model(model, args=()):
+    """Function turning an object into the dict of a restx model
+
+    Values are read from the attributes of the object, except for the keys in
+    `args`, which are taken as they are from the extra positional arguments,
+    in that order. Fields with a conversion in CONVERSIONS are formatted as
+    `marshal` would, other fields go through their own `output`.
+    """
+    namespace = {"_fields": dict(model.items())}
+    items = []
+    for key, field in model.items():
+        if key in args:
+            items.append(f"{key!r}: arg{args.index(key)}")
+            continue
+
+        attribute = field.attribute or key
+        conversion = CONVERSIONS.get(type(field))
+        if conversion is None or not isinstance(attribute, str):
+            items.append(f"{key!r}: _fields[{key!r}].output({key!r}, obj)")
+            continue
+        if not attribute.isidentifier():
+            getter = f"getattr(obj, {attribute!r}, None)"
+        else:
+            getter = f"obj.{attribute}"
+        default = f"_default{len(items)}"
+        namespace[default] = _default_value(field)
+        items.append(
+            f"{key!r}: ({conversion} if (v := {getter}) is not None else {default})"
+        )
+
+    params = ", ".join(["obj", *(f"arg{i}" for i in range(len(args)))])
+    source = f"def serialize({params}):\n    return {{{', '.join(items)}}}\n"
+    exec(compile(source, f"<serializer {model.name}>", "exec"), namespace)
+    serialize = namespace["serialize"]
+    serialize.__doc__ = f"Serialize an object as a {model.name}"
+    return serialize
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding with orjson when it is available
+
+    Values orjson can't encode natively, dates included so that they are
+    formatted as Flask does, go through the `default` of Flask.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get("indent") or kwargs.get("cls"):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def dumps(obj):
+    """Compact JSON of obj, with the provider of the current app"""
+    return current_app.json.dumps(obj, sort_keys=False)
+
+
+def output_json(data, code, headers=None):
+    """restx representation of JSON responses through the app's provider"""
+    settings = dict(current_app.config.get("RESTX_JSON", {}))
+    if current_app.debug:
+        settings.setdefault("indent", 4)
+    settings.setdefault("sort_keys", False)
+    response = make_response(current_app.json.dumps(data, **settings) + "\n", code)
+    response.headers.extend(headers or {})
+    return response
+
+
+def init_json(app, api):
+    """Encode the JSON responses of the app and of `api` with the provider"""
+    app.json = JSONProvider(app)
+    api.representations["application/json"] = output_json
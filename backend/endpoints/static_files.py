@@ -0,0 +1,75 @@
+import mimetypes
+import os
+import re
+
+from flask import abort, current_app, redirect, request, send_from_directory
+
+from .storage import get_storage
+
+# Folders of static/ that may be served
+MEDIA_FOLDERS = {"amenities_images", "profile_images", "bookings_qr"}
+
+# Uploads are named after a hash of their content, so they never change
+CONTENT_HASHED = re.compile(r"^[0-9a-f]{32}(_[a-z]+)?\.[a-z0-9]+$")
+
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def serve_media(folder, filename):
+    """Serve an uploaded file with long-lived caching
+
+    Content-hashed files are marked immutable and carry their name as a strong
+    ETag. Range and conditional requests are answered by send_file. With
+    MEDIA_SENDFILE set to "x-accel" the transfer is handed to nginx, with
+    "x-sendfile" Werkzeug emits X-Sendfile through USE_X_SENDFILE. Media in
+    remote storage is redirected to.
+    """
+    if folder not in MEDIA_FOLDERS:
+        abort(404)
+
+    storage = get_storage()
+    if not storage.local:
+        # Remote storage serves the bytes itself
+        return redirect(storage.url(folder, filename), code=302)
+
+    directory = os.path.join(storage.root, folder)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    immutable = bool(CONTENT_HASHED.match(filename))
+    max_age = current_app.config["MEDIA_MAX_AGE"] if immutable else 3600
+
+    # Serve a precompressed sibling when the client accepts it
+    encoding = None
+    served_name = filename
+    for name, suffix in PRECOMPRESSED:
+        if name in request.accept_encodings and os.path.isfile(
+            os.path.join(directory, filename + suffix)
+        ):
+            encoding, served_name = name, filename + suffix
+            break
+
+    if current_app.config.get("MEDIA_SENDFILE") == "x-accel":
+        if not os.path.isfile(os.path.join(directory, served_name)):
+            abort(404)
+        location = f"{current_app.config['MEDIA_ACCEL_PREFIX']}{folder}/{served_name}"
+        response = current_app.response_class(
+            mimetype=mimetype, headers={"X-Accel-Redirect": location}
+        )
+    else:
+        etag = served_name if immutable else True
+        response = send_from_directory(
+            directory,
+            served_name,
+            mimetype=mimetype,
+            conditional=True,
+            etag=etag,
+            max_age=max_age,
+        )
+
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
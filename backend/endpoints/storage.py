@@ -0,0 +1,186 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from flask import current_app
+
+# Media files are addressed by (folder, name) and stored through one of the
+# backends below, picked with MEDIA_STORAGE. Uploads are streamed through in
+# CHUNK_SIZE pieces and named after the hash of their content.
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _copy_hashed(stream, out):
+    """Copy stream into out chunk by chunk, returning the content hash"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        out.write(chunk)
+    return digest.hexdigest()[:32]
+
+
+class LocalStorage:
+    """Stores media in folders under a local directory"""
+
+    local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, folder, name):
+        return os.path.join(self.root, folder, os.path.basename(name))
+
+    def save_stream(self, folder, stream, extension):
+        directory = os.path.join(self.root, folder)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "wb") as out:
+            name = f"{_copy_hashed(stream, out)}.{extension}"
+        os.replace(tmp_path, self.path(folder, name))
+        return name
+
+    def put_file(self, folder, name, src_path):
+        os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+        shutil.move(src_path, self.path(folder, name))
+
+    def put_bytes(self, folder, name, data):
+        directory = os.path.join(self.root, folder)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, self.path(folder, name))
+
+    def read_bytes(self, folder, name):
+        try:
+            with open(self.path(folder, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def local_copy(self, folder, name):
+        yield self.path(folder, name)
+
+    def exists(self, folder, name):
+        return os.path.isfile(self.path(folder, name))
+
+    def delete(self, folder, name):
+        try:
+            os.remove(self.path(folder, name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def url(self, folder, name):
+        return None
+
+
+class S3Storage:
+    """Stores media in an S3-compatible bucket, one key prefix per folder
+
+    endpoint_url points the client at MinIO or another local stand-in.
+    """
+
+    local = False
+
+    def __init__(
+        self, bucket, prefix="", endpoint_url=None, region=None, public_url=None
+    ):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("S3 media storage requires boto3 to be installed") from e
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.public_url = public_url.rstrip("/") if public_url else None
+
+    def key(self, folder, name):
+        key = f"{folder}/{os.path.basename(name)}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def save_stream(self, folder, stream, extension):
+        # The name depends on the whole content, so the upload is spooled
+        # (in memory up to 1MB, then to disk) before it is sent in parts
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            name = f"{_copy_hashed(stream, spool)}.{extension}"
+            spool.seek(0)
+            if not self.exists(folder, name):
+                self.client.upload_fileobj(spool, self.bucket, self.key(folder, name))
+        return name
+
+    def put_file(self, folder, name, src_path):
+        self.client.upload_file(src_path, self.bucket, self.key(folder, name))
+        os.remove(src_path)
+
+    def put_bytes(self, folder, name, data):
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key(folder, name), Body=data
+        )
+
+    def read_bytes(self, folder, name):
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self.key(folder, name)
+            )
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    @contextmanager
+    def local_copy(self, folder, name):
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1])
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.key(folder, name), tmp_path)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    def exists(self, folder, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(folder, name))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def delete(self, folder, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(folder, name))
+        return True
+
+    def url(self, folder, name):
+        if self.public_url:
+            return f"{self.public_url}/{self.key(folder, name)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.key(folder, name)},
+            ExpiresIn=3600,
+        )
+
+
+def init_storage(app):
+    """Create the media storage backend configured for the app"""
+    backend = app.config.get("MEDIA_STORAGE", "local")
+    if backend == "s3":
+        storage = S3Storage(
+            bucket=app.config["S3_BUCKET"],
+            prefix=app.config.get("S3_PREFIX", ""),
+            endpoint_url=app.config.get("S3_ENDPOINT_URL") or None,
+            region=app.config.get("S3_REGION") or None,
+            public_url=app.config.get("S3_PUBLIC_URL") or None,
+        )
+    else:
+        root = app.config.get("MEDIA_ROOT") or os.path.join(app.root_path, "static")
+        storage = LocalStorage(root)
+    app.extensions["media_storage"] = storage
+    return storage
+
+
+def get_storage():
+    """The media storage backend of the current app"""
+    return current_app.extensions["media_storage"]
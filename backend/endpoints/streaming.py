@@ -0,0 +1,56 @@
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+
+from .serializers import dumps
+
+# List endpoints can stream their whole result instead of building it in
+# memory: rows are read from a server-side cursor `STREAM_BATCH_SIZE` at a time
+# and each batch is written out as soon as it is serialized. Clients opt in
+# with `?stream=json` (one JSON array) or `?stream=ndjson`, or by accepting
+# application/x-ndjson.
+
+MIMETYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def stream_format():
+    """Format of the streamed response the client asked for, or None"""
+    fmt = request.args.get("stream")
+    if fmt in ("1", "true", "json"):
+        return "json"
+    if fmt == "ndjson" or request.accept_mimetypes.best == MIMETYPES["ndjson"]:
+        return "ndjson"
+    return None
+
+
+def batch_size():
+    return current_app.config.get("STREAM_BATCH_SIZE", 500)
+
+
+def stream_response(rows, serialize, fmt, headers=None):
+    """Response writing `rows` a batch at a time
+
+    `rows` is a lazy query run with `yield_per`, so it only executes once the
+    response is sent, and `serialize` turns a list of rows into a list of
+    dicts, which lets it load related data for the whole batch at once.
+    """
+    size = batch_size()
+
+    def generate():
+        iterator = iter(rows)
+        separator = ""
+        if fmt == "json":
+            yield "["
+        while batch := list(islice(iterator, size)):
+            items = [dumps(item) for item in serialize(batch)]
+            if fmt == "json":
+                yield separator + ",".join(items)
+                separator = ","
+            else:
+                yield "".join(item + "\n" for item in items)
+        if fmt == "json":
+            yield "]"
+
+    return Response(
+        stream_with_context(generate()), mimetype=MIMETYPES[fmt], headers=headers
+    )
@@ -0,0 +1,315 @@
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from flask import current_app
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+
+from exts import db
+from models import Amenity, Booking, Category, Media, Review, User, search_index
+
+from .booking_ns import qr_code_payload
+from .bulk import insert_rows
+from .qr_code_util import generate_qr_code
+
+# Synthetic datasets for load and query plan testing. The output only depends
+# on the seed and the options, rows get explicit ids following the existing
+# ones. Amenity popularity and user activity follow Zipf laws, so a few
+# amenities take most bookings as in production. Bookings of an amenity are
+# laid out one after another in half hour slots during opening hours, with
+# exponential gaps between them, and never overlap. Rows are produced by
+# generators and written a batch at a time (COPY on Postgres with psycopg2),
+# each batch in its own transaction, so memory stays flat for millions of rows.
+
+CATEGORIES = ("Studio", "Court", "Pool", "Hall", "Office", "Garden", "Gym", "Room")
+WORDS = (
+    "bright quiet large cozy modern rustic central sunny open private shared "
+    "indoor outdoor classic spacious green urban riverside downtown historic"
+).split()
+CITIES = ("Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika", "Malindi")
+
+OPENS = 8  # Hour of the first slot of the day
+SLOTS = 28  # Half hour slots per day, 8:00 to 22:00
+DURATIONS = (2, 3, 4, 6, 8)  # Booking lengths in slots, 1 to 4 hours
+DURATION_WEIGHTS = (45, 20, 20, 10, 5)
+MEAN_DURATION = sum(map(int.__mul__, DURATIONS, DURATION_WEIGHTS)) / 100
+# Share of its opening hours the busiest amenity is booked for
+MAX_OCCUPANCY = 0.8
+
+
+def zipf_weights(n, alpha, rng):
+    """Cumulative Zipf weights of n items, ranks shuffled so that popularity
+    does not follow the ids"""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return list(accumulate(rank**-alpha for rank in ranks))
+
+
+def spread(total, cum_weights, cap):
+    """Split total into integer shares proportional to the weights, none
+    above cap, the excess of capped shares going to the others"""
+    weights = [b - a for a, b in zip([0, *cum_weights], cum_weights)]
+    shares = [0] * len(weights)
+    remaining = list(range(len(weights)))
+    while total > 0 and remaining:
+        cumulative = list(accumulate(weights[i] for i in remaining))
+        scale = total / cumulative[-1]
+        previous, uncapped = 0, []
+        for i, weight in zip(remaining, cumulative):
+            current = round(weight * scale)
+            share = min(current - previous, cap - shares[i])
+            previous = current
+            shares[i] += share
+            total -= share
+            if shares[i] < cap:
+                uncapped.append(i)
+        remaining = uncapped
+    return shares
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+class Writer:
+    """Buffers rows per model and writes them a batch at a time"""
+
+    def __init__(self, batch_size, echo=None):
+        self.batch_size = batch_size
+        self.echo = echo
+        self.buffers = {}
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def add(self, model, row):
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for model in [model] if model is not None else list(self.buffers):
+            rows = self.buffers.pop(model, None)
+            if not rows:
+                continue
+            table = model.__table__
+            insert_rows(table, list(rows[0]), rows)
+            db.session.commit()
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+            if self.echo is not None:
+                elapsed = time.perf_counter() - self.started
+                rate = sum(self.counts.values()) / elapsed
+                self.echo(
+                    f"{table.name}: {self.counts[table.name]} rows ({rate:,.0f} rows/s)"
+                )
+
+
+def _slot_time(start, slot):
+    day, slot = divmod(slot, SLOTS)
+    return start + timedelta(days=day, hours=OPENS, minutes=30 * slot)
+
+
+def _bookings(rng, count, slots):
+    """Non overlapping (first slot, length) of count bookings in slots slots
+
+    Gaps are drawn with the mean that spreads the remaining bookings over the
+    remaining free slots, and take at most half of them, so that all count
+    bookings fit.
+    """
+    durations = rng.choices(DURATIONS, DURATION_WEIGHTS, k=count)
+    booked = sum(durations)
+    slot = 0
+    for i, duration in enumerate(durations):
+        free = slots - slot - booked
+        if free > 0:
+            # At most half the free slots, so the last bookings still fit
+            slot += int(min(rng.expovariate((count - i) / free), free / 2))
+        # Bookings end by closing time
+        if slot % SLOTS + duration > SLOTS:
+            slot += SLOTS - slot % SLOTS
+        if slot + duration > slots:
+            return
+        yield slot, duration
+        slot += duration
+        booked -= duration
+
+
+def generate(
+    users,
+    amenities,
+    bookings,
+    media=3,
+    review_rate=0.3,
+    days=365,
+    start=None,
+    alpha=1.1,
+    seed=1,
+    batch_size=5000,
+    password="password",
+    echo=None,
+):
+    """Insert a synthetic dataset, returning the number of rows per table
+
+    Bookings cover `days` days from `start`, by default centered on today.
+    Those ending before the middle of the period are checked in or canceled,
+    later ones are booked or canceled. Checked in bookings are reviewed at
+    `review_rate`, once per user and amenity. Amenities are booked for at most
+    MAX_OCCUPANCY of their opening hours, the bookings popular amenities can't
+    take go to the others.
+    """
+    rng = random.Random(seed)
+    start = start or date.today() - timedelta(days=days // 2)
+    start = datetime(start.year, start.month, start.day)
+    middle = start + timedelta(days=days / 2)
+    writer = Writer(batch_size, echo)
+
+    categories = db.select(Category.id, Category.name).order_by(Category.id)
+    if db.session.execute(categories).first() is None:
+        insert_rows(
+            Category.__table__, ("name",), [{"name": name} for name in CATEGORIES]
+        )
+        db.session.commit()
+    categories = db.session.execute(categories).all()
+
+    first_user = _next_id(User)
+    hashed = generate_password_hash(
+        password, method=current_app.config["PASSWORD_HASH_METHOD"]
+    )
+    owner_ids = []
+    for user_id in range(first_user, first_user + users):
+        is_owner = rng.random() < 0.05 or not owner_ids
+        if is_owner:
+            owner_ids.append(user_id)
+        writer.add(
+            User,
+            {
+                "id": user_id,
+                "firstname": rng.choice(WORDS).title(),
+                "lastname": f"User {user_id}",
+                "username": f"synthetic{user_id}",
+                "email": f"synthetic{user_id}@example.com",
+                "password": hashed,
+                "profile": None,
+                "verified": True,
+                "is_owner": is_owner,
+            },
+        )
+    writer.flush(User)
+    user_ids = range(first_user, first_user + users)
+
+    first_amenity = _next_id(Amenity)
+    names = {}
+    quality = {}
+    owner_weights = zipf_weights(len(owner_ids), alpha, rng)
+    for amenity_id in range(first_amenity, first_amenity + amenities):
+        category = rng.choice(categories)
+        words = " ".join(rng.sample(WORDS, 4))
+        names[amenity_id] = f"{rng.choice(WORDS).title()} {category.name} {amenity_id}"
+        quality[amenity_id] = rng.uniform(2.5, 4.8)
+        writer.add(
+            Amenity,
+            {
+                "id": amenity_id,
+                "name": names[amenity_id],
+                "description": f"{words} {category.name.lower()}",
+                "price_per_hour": float(rng.randrange(5, 200)),
+                "address": f"{rng.randrange(1, 999)} Main Road, {rng.choice(CITIES)}",
+                "category_id": category.id,
+                "owner_id": owner_ids[
+                    bisect(owner_weights, rng.random() * owner_weights[-1])
+                ],
+            },
+        )
+    writer.flush(Amenity)
+
+    media_id = _next_id(Media)
+    for amenity_id in range(first_amenity, first_amenity + amenities):
+        for k in range(media):
+            writer.add(
+                Media,
+                {
+                    "id": media_id,
+                    "amenity_id": amenity_id,
+                    "url": f"synthetic/{amenity_id}_{k}.jpg",
+                    "type": "image",
+                    "variants": None,
+                    "card_url": None,
+                },
+            )
+            media_id += 1
+    writer.flush(Media)
+
+    booking_id = _next_id(Booking)
+    review_id = _next_id(Review)
+    reviewed = set()
+    user_weights = zipf_weights(users, alpha, rng)
+    capacity = int(days * SLOTS * MAX_OCCUPANCY / MEAN_DURATION)
+    shares = spread(bookings, zipf_weights(amenities, alpha, rng), capacity)
+    for amenity_id, share in zip(
+        range(first_amenity, first_amenity + amenities), shares
+    ):
+        amenity = Amenity(id=amenity_id, name=names[amenity_id])
+        for slot, duration in _bookings(rng, share, days * SLOTS):
+            start_time = _slot_time(start, slot)
+            end_time = _slot_time(start, slot + duration - 1) + timedelta(minutes=30)
+            user_id = user_ids[bisect(user_weights, rng.random() * user_weights[-1])]
+            if end_time <= middle:
+                status = "checked_in" if rng.random() < 0.85 else "canceled"
+            else:
+                status = "booked" if rng.random() < 0.9 else "canceled"
+            writer.add(
+                Booking,
+                {
+                    "id": booking_id,
+                    "user_id": user_id,
+                    "amenity_id": amenity_id,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "status": status,
+                    "qr_code": generate_qr_code(
+                        qr_code_payload(amenity, start_time, end_time)
+                    ),
+                    "expires_at": start_time + timedelta(hours=1),
+                },
+            )
+            booking_id += 1
+
+            pair = amenity_id * (first_user + users) + user_id
+            if (
+                status == "checked_in"
+                and rng.random() < review_rate
+                and pair not in reviewed
+            ):
+                reviewed.add(pair)
+                rating = round(rng.gauss(quality[amenity_id], 0.9))
+                writer.add(
+                    Review,
+                    {
+                        "id": review_id,
+                        "user_id": user_id,
+                        "amenity_id": amenity_id,
+                        "rating": min(5, max(1, rating)),
+                        "comment": " ".join(rng.sample(WORDS, 5)).capitalize(),
+                    },
+                )
+                review_id += 1
+    writer.flush()
+
+    if db.engine.dialect.name == "postgresql":
+        # Rows were inserted with explicit ids, move the sequences past them
+        for model in (User, Amenity, Media, Booking, Review):
+            table = model.__tablename__
+            db.session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT max(id) FROM {table}))"
+                )
+            )
+        db.session.commit()
+
+    search_index.rebuild()
+    Amenity.rebuild_ratings()
+    return writer.counts
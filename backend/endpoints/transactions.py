@@ -0,0 +1,64 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+
+from exts import db
+
+# Each request is one unit of work. Model save()/update()/delete() only stage
+# their changes in the session, and the request commits them once after the
+# handler returns a successful response, or rolls them back on an error
+# response. Work that must only happen once the changes are durable is
+# registered with `on_commit`.
+
+
+def on_commit(func):
+    """Call `func` after the request commits, or right away outside a request"""
+    if has_request_context():
+        g.setdefault("on_commit", []).append(func)
+    else:
+        func()
+
+
+def has_writes(session):
+    """Whether the session has flushed or pending changes"""
+    return bool(
+        session.info.get("writes") or session.new or session.dirty or session.deleted
+    )
+
+
+@event.listens_for(db.session, "after_flush")
+def flushed(session, flush_context):
+    session.info["writes"] = True
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def executed(orm_execute_state):
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["writes"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_rollback")
+def ended(session):
+    session.info.pop("writes", None)
+
+
+def init_transactions(app):
+    """Commit or roll back the session once at the end of every request"""
+
+    @app.after_request
+    def commit_request(response):
+        callbacks = g.pop("on_commit", [])
+        if response.status_code >= 400:
+            db.session.rollback()
+            return response
+
+        if has_writes(db.session):
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        for callback in callbacks:
+            callback()
+        return response
@@ -0,0 +1,55 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from exts import db
+from models import User
+
+from .cache import LRUCache
+
+# flask-jwt-extended resolves `current_user` through the loader below, once per
+# request. Users are cached per worker as detached snapshots of their columns
+# and merged into the request session without a query. Updates and deletes
+# made by this worker evict the entry, other workers see them within
+# USER_CACHE_TTL seconds.
+
+
+def _snapshot(user):
+    """Detached copy of the column state of a user"""
+    state = inspect(User)
+    snapshot = User(
+        **{attr.key: getattr(user, attr.key) for attr in state.column_attrs}
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def evict_user(mapper, connection, target):
+    cache = current_app.extensions.get("user_cache") if has_app_context() else None
+    if cache is not None:
+        cache.delete(target.id)
+
+
+def init_user_loader(app, jwt):
+    """Register the cached user lookup on the JWT manager"""
+    cache = LRUCache(
+        maxsize=app.config.get("USER_CACHE_SIZE", 1000),
+        ttl=app.config.get("USER_CACHE_TTL", 30),
+    )
+    app.extensions["user_cache"] = cache
+
+    @jwt.user_lookup_loader
+    def load_user(jwt_header, jwt_payload):
+        user_id = int(jwt_payload["sub"])
+        snapshot = cache.get(user_id)
+        if snapshot is not None:
+            return db.session.merge(snapshot, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.set(user_id, _snapshot(user))
+        return user
+
+    return cache
@@ -1,3 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    """Session sending plain selects to the engine in `info["replica"]`
+
+    The replica is set per request by `endpoints.replicas`. Any flush or DML
+    statement drops it, so the rest of the request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if replica is not None and bind is None:
+            if self._flushing or getattr(clause, "is_dml", False):
+                self.info.pop("replica")
+            elif getattr(clause, "is_select", False) and clause._for_update_arg is None:
+                return replica
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
@@ -0,0 +1,19 @@
+import os
+import shutil
+
+# Workers write their Prometheus metrics to PROMETHEUS_MULTIPROC_DIR, which is
+# emptied at startup and cleared of the live gauges of each exiting worker.
+
+
+def on_starting(server):
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
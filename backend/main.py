@@ -1,10 +1,36 @@
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from flask_restx import Api, Resource
 
-from endpoints import amenities_ns, auth_ns, booking_ns, reviews_ns, search_ns
+from commands import (
+    bulk_cli,
+    data_cli,
+    jobs_cli,
+    ratings_cli,
+    search_cli,
+    tokens_cli,
+)
+from endpoints import (
+    amenities_ns,
+    auth_ns,
+    booking_ns,
+    bulk_ns,
+    reviews_ns,
+    search_ns,
+)
+from endpoints.database import init_db_pool
+from endpoints.metrics import init_metrics
+from endpoints.profiler import init_profiler
+from endpoints.replicas import init_replicas
+from endpoints.response_cache import init_response_cache
+from endpoints.revocation import init_jwt_errors, init_revocation
+from endpoints.serializers import init_json
+from endpoints.static_files import serve_media
+from endpoints.storage import init_storage
+from endpoints.transactions import init_transactions
+from endpoints.users import init_user_loader
 from exts import db
 from models import Amenity, Booking, Category, Media, Review, User
 
@@ -13,12 +39,33 @@ def create_app(config):
     app = Flask(__name__)
     app.config.from_object(config)
 
-    CORS(app, resources={r"/api/*": {"origins": "https://bookaspot.onrender.com"}})
+    CORS(
+        app,
+        resources={r"/api/*": {"origins": "https://bookaspot.onrender.com"}},
+        # Pagination cursors followed by the frontend
+        expose_headers=["Link", "X-Next-Cursor"],
+    )
 
+    init_replicas(app)
+    init_db_pool(app)
     db.init_app(app)
+    init_profiler(app)
+    init_metrics(app)
+    init_transactions(app)
+    init_storage(app)
     migrate = Migrate(app, db)
 
-    JWTManager(app)
+    jwt = JWTManager(app)
+    init_revocation(app, jwt)
+    init_user_loader(app, jwt)
+    init_response_cache(app)
+
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(tokens_cli)
+    app.cli.add_command(bulk_cli)
+    app.cli.add_command(data_cli)
 
     api = Api(
         app,
@@ -26,11 +73,14 @@ def create_app(config):
         version="1.0",
         description="Bookaspot is an online platform where users can easily rent and lease various amenities such as swimming pools, event halls, and football stadiums.",
     )
+    init_json(app, api)
+    init_jwt_errors(api)
     api.add_namespace(auth_ns, path="/api/auth")
     api.add_namespace(amenities_ns, path="/api/amenities")
     api.add_namespace(reviews_ns, path="/api/reviews")
     api.add_namespace(booking_ns, path="/api/booking")
     api.add_namespace(search_ns, path="/api/search")
+    api.add_namespace(bulk_ns, path="/api/bulk")
 
     @api.route("/api/hello")
     class Hello(Resource):
@@ -39,6 +89,6 @@ def create_app(config):
 
     @app.route("/api/<folder>/<filename>")
     def uploaded_file(folder, filename):
-        return send_from_directory(f"static/{folder}", filename)
+        return serve_media(folder, filename)
 
     return app
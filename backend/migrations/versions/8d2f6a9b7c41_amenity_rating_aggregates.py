@@ -0,0 +1,43 @@
+"""Amenity rating aggregates
+
+Revision ID: 8d2f6a9b7c41
+Revises: 3b8e1f4c2a10
+Create Date: 2026-10-18 10:02:13.604518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f6a9b7c41'
+down_revision = '3b8e1f4c2a10'
+branch_labels = None
+depends_on = None
+
+RATING_COLUMNS = ['rating_sum', 'rating_count'] + [f'rating_{star}' for star in range(1, 6)]
+
+
+def upgrade():
+    with op.batch_alter_table('amenities', schema=None) as batch_op:
+        for name in RATING_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing reviews
+    stars = ', '.join(
+        f'rating_{star} = (SELECT COUNT(*) FROM reviews'
+        f' WHERE reviews.amenity_id = amenities.id AND reviews.rating = {star})'
+        for star in range(1, 6)
+    )
+    op.execute(
+        'UPDATE amenities SET '
+        'rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.amenity_id = amenities.id), '
+        'rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.amenity_id = amenities.id), '
+        + stars
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('amenities', schema=None) as batch_op:
+        for name in reversed(RATING_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,39 @@
+"""Booking overlap constraint
+
+Revision ID: c5a7e2d94f18
+Revises: 8d2f6a9b7c41
+Create Date: 2026-10-18 11:25:51.230746
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e2d94f18'
+down_revision = '8d2f6a9b7c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_amenity_period', ['amenity_id', 'start_time', 'end_time'], unique=False)
+
+    # Overlapping active bookings are rejected by Postgres itself; other
+    # databases rely on Booking.lock_amenity
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute(
+            'ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap '
+            'EXCLUDE USING gist (amenity_id WITH =, tsrange(start_time, end_time) WITH &&) '
+            "WHERE (status = 'booked')"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE bookings DROP CONSTRAINT bookings_no_overlap')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_amenity_period')
@@ -0,0 +1,49 @@
+"""Amenity text search
+
+Revision ID: e19b4d7a3c65
+Revises: c5a7e2d94f18
+Create Date: 2026-10-18 12:41:07.882915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19b4d7a3c65'
+down_revision = 'c5a7e2d94f18'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "(setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(address, '')), 'C'))"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(f'CREATE INDEX ix_amenities_search ON amenities USING gin ({SEARCH_VECTOR})')
+        op.execute('CREATE INDEX ix_amenities_address_trgm ON amenities USING gin (address gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS amenities_fts "
+            "USING fts5(name, description, address, tokenize = 'porter unicode61')"
+        )
+        op.execute("INSERT INTO amenities_fts (amenities_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 2.0)')")
+        op.execute(
+            'INSERT INTO amenities_fts (rowid, name, description, address) '
+            'SELECT id, name, description, address FROM amenities'
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_amenities_address_trgm', table_name='amenities')
+        op.drop_index('ix_amenities_search', table_name='amenities')
+    elif dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS amenities_fts')
@@ -1,6 +1,9 @@
 from .amenities import Amenity
 from .booking import Booking
 from .categories import Category
+from .job import Job
 from .media import Media
 from .reviews import Review
+from .revoked_token import RevokedToken
+from .table_version import TableVersion
 from .user import User
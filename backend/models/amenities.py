@@ -1,12 +1,32 @@
 from datetime import datetime
 
+from sqlalchemy import event, func, inspect
+
 from exts import db
 
+from . import search_index
+
 
 class Amenity(db.Model):
     """Defines an amenity model"""
 
     __tablename__ = "amenities"
+    __table_args__ = (
+        db.Index(
+            "ix_amenities_search",
+            search_index.search_vector(
+                db.column("name"), db.column("description"), db.column("address")
+            ),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        # Makes the substring match on the search location indexable
+        db.Index(
+            "ix_amenities_address_trgm",
+            "address",
+            postgresql_using="gin",
+            postgresql_ops={"address": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = db.Column(db.Integer(), primary_key=True, autoincrement=True, nullable=False)
     name = db.Column(db.String(255), unique=True, nullable=False)
@@ -18,6 +38,17 @@ class Amenity(db.Model):
     )
     owner_id = db.Column(db.Integer(), db.ForeignKey("users.id"), nullable=False)
 
+    # Rating aggregates maintained by the Review mapper events
+    rating_sum = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+    rating_count = db.Column(
+        db.Integer(), nullable=False, default=0, server_default="0"
+    )
+    rating_1 = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+    rating_2 = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+    rating_3 = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+    rating_4 = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+    rating_5 = db.Column(db.Integer(), nullable=False, default=0, server_default="0")
+
     images = db.relationship(
         "Media", back_populates="amenity", cascade="all, delete-orphan"
     )
@@ -30,19 +61,127 @@ class Amenity(db.Model):
         "Review", back_populates="amenity", cascade="all, delete-orphan"
     )
 
+    @property
+    def average_rating(self):
+        """Average review rating, 0 when the amenity has no reviews"""
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star"""
+        return {star: getattr(self, f"rating_{star}") for star in range(1, 6)}
+
+    @classmethod
+    def average_rating_expr(cls):
+        """SQL expression of the average rating, for use in queries"""
+        return db.case(
+            (cls.rating_count > 0, cls.rating_sum * 1.0 / cls.rating_count),
+            else_=0.0,
+        )
+
+    @classmethod
+    def rating_delta(cls, rating, sign):
+        """Column increments applying (sign=1) or removing (sign=-1) a rating"""
+        values = {
+            "rating_sum": cls.rating_sum + sign * rating,
+            "rating_count": cls.rating_count + sign,
+        }
+        if 1 <= rating <= 5:
+            column = getattr(cls, f"rating_{rating}")
+            values[f"rating_{rating}"] = column + sign
+        return values
+
+    @classmethod
+    def rebuild_ratings(cls, batch_size=1000):
+        """Recompute the rating aggregates of every amenity from its reviews
+
+        Amenities are updated in primary key ranges so that a rebuild on a
+        large table never holds locks on all rows at once.
+        """
+        from .reviews import Review
+
+        def reviews(*criteria):
+            return (
+                db.select(func.count(Review.id))
+                .where(Review.amenity_id == cls.id, *criteria)
+                .scalar_subquery()
+            )
+
+        values = {
+            "rating_sum": db.select(func.coalesce(func.sum(Review.rating), 0))
+            .where(Review.amenity_id == cls.id)
+            .scalar_subquery(),
+            "rating_count": reviews(),
+        }
+        for star in range(1, 6):
+            values[f"rating_{star}"] = reviews(Review.rating == star)
+
+        last_id = db.session.query(func.max(cls.id)).scalar() or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            result = db.session.execute(
+                db.update(cls)
+                .where(cls.id > start, cls.id <= start + batch_size)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            updated += result.rowcount
+        return updated
+
     def save(self):
         """Method to save an amenity"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, **kwargs):
         """Method to update amenity information"""
         for key, value in kwargs.items():
             if hasattr(self, key) and value is not None:
                 setattr(self, key, value)
-        db.session.commit()
 
     def delete(self):
         """Method to delete an amenity"""
         db.session.delete(self)
-        db.session.commit()
+
+
+event.listen(
+    Amenity.__table__,
+    "before_create",
+    search_index.create_pg_extensions.execute_if(dialect="postgresql"),
+)
+event.listen(
+    Amenity.__table__,
+    "after_create",
+    search_index.create_fts_table.execute_if(dialect="sqlite"),
+)
+event.listen(
+    Amenity.__table__,
+    "after_create",
+    search_index.configure_fts_rank.execute_if(dialect="sqlite"),
+)
+event.listen(
+    Amenity.__table__,
+    "after_drop",
+    search_index.drop_fts_table.execute_if(dialect="sqlite"),
+)
+
+
+@event.listens_for(Amenity, "after_insert")
+def amenity_inserted(mapper, connection, target):
+    search_index.index_amenity(connection, target)
+
+
+@event.listens_for(Amenity, "after_update")
+def amenity_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(
+        state.attrs[key].history.has_changes()
+        for key in ("name", "description", "address")
+    ):
+        search_index.index_amenity(connection, target)
+
+
+@event.listens_for(Amenity, "after_delete")
+def amenity_deleted(mapper, connection, target):
+    search_index.unindex_amenity(connection, target.id)
@@ -1,10 +1,28 @@
 from datetime import datetime
 
+from sqlalchemy import DDL, event, func
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
 from exts import db
 
+from .amenities import Amenity
+
 
 class Booking(db.Model):
     __tablename__ = "bookings"
+    __table_args__ = (
+        db.Index("ix_bookings_amenity_period", "amenity_id", "start_time", "end_time"),
+        # Postgres rejects overlapping active bookings of an amenity itself,
+        # through a GiST index on the booked period (needs btree_gist, created
+        # before the table below)
+        ExcludeConstraint(
+            ("amenity_id", "="),
+            (func.tsrange(db.column("start_time"), db.column("end_time")), "&&"),
+            name="bookings_no_overlap",
+            using="gist",
+            where="status = 'booked'",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, nullable=False)
     user_id = db.Column(db.Integer(), db.ForeignKey("users.id"), nullable=False)
@@ -15,16 +33,47 @@ class Booking(db.Model):
         db.Enum("booked", "canceled", "checked_in", name="booking_status"),
         default="pending",
     )
-    qr_code = db.Column(db.String(), nullable=True)
+    qr_code = db.Column(db.String(), nullable=True, index=True)
     expires_at = db.Column(db.DateTime(), nullable=True)
 
     user = db.relationship("User")
     amenity = db.relationship("Amenity", back_populates="bookings")
 
+    @classmethod
+    def lock_amenity(cls, amenity_id):
+        """Serialize booking writes for an amenity until the transaction ends
+
+        Postgres takes a row lock on the amenity. SQLite has no row locks, so a
+        no-op update is issued instead to take the database write lock early,
+        as plain SQL so that it isn't counted as a change of the amenities.
+        """
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(
+                db.text("UPDATE amenities SET id = id WHERE id = :id"),
+                {"id": amenity_id},
+            )
+        else:
+            db.session.execute(
+                db.select(Amenity.id).where(Amenity.id == amenity_id).with_for_update()
+            )
+
+    @classmethod
+    def overlapping(cls, amenity_id, start_time, end_time, exclude_id=None):
+        """Query the active bookings of an amenity overlapping a period"""
+        query = cls.query.filter(
+            cls.amenity_id == amenity_id,
+            cls.status == "booked",
+            cls.start_time < end_time,
+            cls.end_time > start_time,
+        )
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        return query
+
     def save(self):
         """Method to save a booking"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, **kwargs):
         """Method to update booking information"""
@@ -32,9 +81,14 @@ class Booking(db.Model):
             if hasattr(self, key) and value is not None:
                 setattr(self, key, value)
         db.session.add(self)
-        db.session.commit()
 
     def delete(self):
         """Method to delete a booking"""
         db.session.delete(self)
-        db.session.commit()
+
+
+event.listen(
+    Booking.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
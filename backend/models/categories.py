@@ -17,16 +17,14 @@ class Category(db.Model):
     def save(self):
         """Method to save a category"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, name=None):
         """Method to update a category"""
         if name:
             self.name = name
         db.session.add(self)
-        db.session.commit()
 
     def delete(self):
         """Method to delete a category"""
         db.session.delete(self)
-        db.session.commit()
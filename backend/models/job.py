@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from exts import db
+
+
+class Job(db.Model):
+    """Defines a background job model"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id = db.Column(db.Integer(), primary_key=True, autoincrement=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON(), nullable=False, default=dict)
+    status = db.Column(
+        db.Enum("queued", "running", "done", "failed", name="job_status"),
+        nullable=False,
+        default="queued",
+    )
+    attempts = db.Column(db.Integer(), nullable=False, default=0)
+    max_attempts = db.Column(db.Integer(), nullable=False, default=5)
+    run_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64), nullable=True)
+    locked_at = db.Column(db.DateTime(), nullable=True)
+    last_error = db.Column(db.Text(), nullable=True)
+    created_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+
+    def save(self):
+        """Method to save a job"""
+        db.session.add(self)
+        db.session.flush()
+
+    def delete(self):
+        """Method to delete a job"""
+        db.session.delete(self)
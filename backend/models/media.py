@@ -7,20 +7,33 @@ class Media(db.Model):
     """Defines a media model"""
 
     __tablename__ = "media"
+    # Serves the "first image of an amenity" cover lookups without a sort
+    __table_args__ = (db.Index("ix_media_amenity_id_id", "amenity_id", "id"),)
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, nullable=False)
-    amenity_id = db.Column(db.Integer(), db.ForeignKey("amenities.id"), nullable=False)
+    amenity_id = db.Column(
+        db.Integer(), db.ForeignKey("amenities.id"), nullable=False, index=True
+    )
     url = db.Column(db.String(), nullable=False)
     type = db.Column(db.Enum("image", "video", name="media_type"), nullable=False)
+    # Resized renditions, {"thumb": {"webp": ..., "jpeg": ...}, "card": ...}
+    variants = db.Column(db.JSON(), nullable=True)
+    card_url = db.Column(db.String(), nullable=True)
 
     amenity = db.relationship("Amenity", back_populates="images")
 
+    def filenames(self):
+        """Names of the original file and of every variant"""
+        names = [self.url]
+        for variant in (self.variants or {}).values():
+            names.extend(variant[fmt] for fmt in ("webp", "jpeg"))
+        return names
+
     def save(self):
         """Method to save a media"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def delete(self):
         """Method to delete a media"""
         db.session.delete(self)
-        db.session.commit()
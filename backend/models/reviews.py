@@ -1,7 +1,11 @@
 from datetime import datetime
 
+from sqlalchemy import event, inspect
+
 from exts import db
 
+from .amenities import Amenity
+
 
 class Review(db.Model):
     """Defines a reviews model"""
@@ -10,7 +14,9 @@ class Review(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, nullable=False)
     user_id = db.Column(db.Integer(), db.ForeignKey("users.id"), nullable=False)
-    amenity_id = db.Column(db.Integer(), db.ForeignKey("amenities.id"), nullable=False)
+    amenity_id = db.Column(
+        db.Integer(), db.ForeignKey("amenities.id"), nullable=False, index=True
+    )
     rating = db.Column(db.Integer(), nullable=False)
     comment = db.Column(db.Text(), nullable=True)
 
@@ -20,9 +26,43 @@ class Review(db.Model):
     def save(self):
         """Method to save a review"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def delete(self):
         """Method to delete a review"""
         db.session.delete(self)
-        db.session.commit()
+
+
+def _apply_rating(connection, amenity_id, rating, sign):
+    """Fold a review rating into the aggregates of its amenity"""
+    connection.execute(
+        db.update(Amenity)
+        .where(Amenity.id == amenity_id)
+        .values(**Amenity.rating_delta(int(rating), sign))
+    )
+
+
+# The aggregates are updated in the flush of the review itself, so they are
+# committed or rolled back together with it, including cascaded deletes.
+@event.listens_for(Review, "after_insert")
+def review_inserted(mapper, connection, target):
+    _apply_rating(connection, target.amenity_id, target.rating, 1)
+
+
+@event.listens_for(Review, "after_delete")
+def review_deleted(mapper, connection, target):
+    _apply_rating(connection, target.amenity_id, target.rating, -1)
+
+
+@event.listens_for(Review, "after_update")
+def review_updated(mapper, connection, target):
+    state = inspect(target)
+    rating = state.attrs.rating.history
+    amenity_id = state.attrs.amenity_id.history
+    if not rating.has_changes() and not amenity_id.has_changes():
+        return
+
+    old_rating = rating.deleted[0] if rating.deleted else target.rating
+    old_amenity_id = amenity_id.deleted[0] if amenity_id.deleted else target.amenity_id
+    _apply_rating(connection, old_amenity_id, old_rating, -1)
+    _apply_rating(connection, target.amenity_id, target.rating, 1)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from exts import db
+
+
+class RevokedToken(db.Model):
+    """Defines a revoked JWT model, kept until the token expires"""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(36), primary_key=True, nullable=False)
+    expires_at = db.Column(db.DateTime(), nullable=False, index=True)
+
+    def save(self):
+        """Method to save a revoked token"""
+        db.session.add(self)
+        db.session.flush()
+
+    def delete(self):
+        """Method to delete a revoked token"""
+        db.session.delete(self)
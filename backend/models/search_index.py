@@ -0,0 +1,128 @@
+from sqlalchemy import DDL, bindparam, func, literal_column, text
+from sqlalchemy.dialects import postgresql  # registers the text search functions
+
+from exts import db
+
+# Text search over amenity name, description and address. Postgres searches a
+# weighted tsvector expression through a GIN expression index, so the index is
+# maintained by Postgres on every write. SQLite has no such index, so an FTS5
+# table is kept in sync by the Amenity mapper events instead.
+
+LANGUAGE = literal_column("'english'")
+FTS_TABLE = "amenities_fts"
+
+create_fts_table = DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, address, tokenize = 'porter unicode61')"
+)
+# Rank matches in the name above the description and address
+configure_fts_rank = DDL(
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+    "VALUES ('rank', 'bm25(10.0, 4.0, 2.0)')"
+)
+drop_fts_table = DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+create_pg_extensions = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+def search_vector(name, description, address):
+    """Weighted tsvector of an amenity, name ranking above the other fields"""
+
+    def weighted(column, weight):
+        return func.setweight(
+            func.to_tsvector(LANGUAGE, func.coalesce(column, literal_column("''"))),
+            literal_column(f"'{weight}'"),
+        )
+
+    return (
+        weighted(name, "A")
+        .op("||")(weighted(description, "B"))
+        .op("||")(weighted(address, "C"))
+    )
+
+
+def fts_query(q):
+    """Quote each search term so FTS5 treats user input as prefix terms"""
+    terms = ['"{}"*'.format(term.replace('"', '""')) for term in q.split()]
+    return " ".join(terms)
+
+
+def index_amenity(connection, amenity):
+    """Write an amenity into the SQLite FTS table"""
+    if connection.dialect.name != "sqlite":
+        return
+    unindex_amenity(connection, amenity.id)
+    connection.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, address) "
+            "VALUES (:id, :name, :description, :address)"
+        ),
+        {
+            "id": amenity.id,
+            "name": amenity.name,
+            "description": amenity.description,
+            "address": amenity.address,
+        },
+    )
+
+
+def index_amenities(connection, names):
+    """Write the amenities with the given names into the SQLite FTS table, for
+    rows inserted without the mapper events"""
+    if connection.dialect.name != "sqlite":
+        return
+    connection.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, address) "
+            "SELECT id, name, description, address FROM amenities "
+            "WHERE name IN :names"
+        ).bindparams(bindparam("names", expanding=True)),
+        {"names": list(names)},
+    )
+
+
+def unindex_amenity(connection, amenity_id):
+    """Remove an amenity from the SQLite FTS table"""
+    if connection.dialect.name != "sqlite":
+        return
+    connection.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": amenity_id}
+    )
+
+
+def rebuild():
+    """Repopulate the search index from the amenities table"""
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(create_fts_table)
+        db.session.execute(configure_fts_rank)
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        db.session.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, address) "
+                "SELECT id, name, description, address FROM amenities"
+            )
+        )
+    else:
+        db.session.execute(text("REINDEX INDEX ix_amenities_search"))
+    db.session.commit()
+
+
+def match(query, model, q):
+    """Restrict an amenity query to matches of `q`, returning it with its
+    best-first ordering"""
+    if db.engine.dialect.name == "sqlite":
+        hits = (
+            db.select(
+                literal_column("rowid").label("amenity_id"),
+                literal_column("rank"),
+            )
+            .select_from(text(FTS_TABLE))
+            .where(text(f"{FTS_TABLE} MATCH :q").bindparams(q=fts_query(q)))
+            .subquery()
+        )
+        query = query.join(hits, hits.c.amenity_id == model.id)
+        return query, hits.c.rank.asc()
+
+    vector = search_vector(model.name, model.description, model.address)
+    ts_query = func.websearch_to_tsquery(LANGUAGE, q)
+    query = query.filter(vector.op("@@")(ts_query))
+    return query, func.ts_rank(vector, ts_query).desc()
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from exts import db
+
+# A version counter per catalog table, incremented by every transaction that
+# writes to the table. Responses built from these tables use the counters as
+# their ETag, so an unchanged catalog is recognized without running the query
+# that builds it. The counters are bumped just before commit, in sorted order,
+# so their row locks are only held while the transaction commits.
+
+VERSIONED_TABLES = ("amenities", "categories", "media", "reviews")
+
+
+class TableVersion(db.Model):
+    """Defines the version counter of a table"""
+
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True, nullable=False)
+    version = db.Column(db.BigInteger(), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def current(cls, tables):
+        """(version, updated_at) of each of the given tables"""
+        rows = db.session.execute(
+            db.select(cls.name, cls.version, cls.updated_at).where(cls.name.in_(tables))
+        )
+        return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+def mark_changed(session, *tables):
+    """Record writes to tables made outside of the ORM flush"""
+    changed = session.info.setdefault("changed_tables", set())
+    changed.update(table for table in tables if table in VERSIONED_TABLES)
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def create_versions(target, connection, **kw):
+    connection.execute(
+        target.insert(),
+        [
+            {"name": name, "version": 0, "updated_at": datetime.utcnow()}
+            for name in VERSIONED_TABLES
+        ],
+    )
+
+
+@event.listens_for(db.session, "after_flush")
+def flushed(session, flush_context):
+    dirty = [instance for instance in session.dirty if session.is_modified(instance)]
+    mark_changed(
+        session,
+        *{
+            instance.__table__.name
+            for instance in (*session.new, *session.deleted, *dirty)
+        },
+    )
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def executed(orm_execute_state):
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        mark_changed(state.session, state.statement.table.name)
+
+
+@event.listens_for(db.session, "before_commit")
+def bump_versions(session):
+    # Savepoints are left to the outer transaction. This runs before the
+    # commit flushes what is still pending
+    if session.in_nested_transaction():
+        return
+    session.flush()
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        session.connection().execute(
+            db.update(TableVersion)
+            .where(TableVersion.name.in_(sorted(changed)))
+            .values(version=TableVersion.version + 1, updated_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def transaction_ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("changed_tables", None)
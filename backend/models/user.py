@@ -28,16 +28,14 @@ class User(db.Model):
     def save(self):
         """Method to save a user"""
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, **kwargs):
         """Method to Update user information"""
         for key, value in kwargs.items():
             if hasattr(self, key) and value is not None:
                 setattr(self, key, value)
-        db.session.commit()
 
     def delete(self):
         """Method to Delete user information"""
         db.session.delete(self)
-        db.session.commit()
@@ -0,0 +1,93 @@
+import os
+
+# Settings config.py requires when it is imported
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", "False")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("ECHO", "False")
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from config import TestConfig
+from exts import db
+from main import create_app
+from models import Amenity, Category, Media, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestConfig):
+        MEDIA_ROOT = str(tmp_path / "media")
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """Id of a verified owner"""
+    with app.app_context():
+        user = User(
+            firstname="Test",
+            lastname="User",
+            username="test",
+            email="test@example.com",
+            password="unused",
+            verified=True,
+            is_owner=True,
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def amenities(app, user):
+    """Ids of five amenities of the user, with two images each"""
+    with app.app_context():
+        category = Category(name="pool")
+        db.session.add(category)
+        amenities = [
+            Amenity(
+                name=f"Pool {i}",
+                description="Heated pool",
+                price_per_hour=10,
+                address=f"{i} Main Road, Nairobi",
+                category=category,
+                owner_id=user,
+            )
+            for i in range(5)
+        ]
+        db.session.add_all(amenities)
+        db.session.flush()
+        for amenity in amenities:
+            for k in range(2):
+                db.session.add(
+                    Media(
+                        amenity_id=amenity.id, url=f"{amenity.id}_{k}.png", type="image"
+                    )
+                )
+        db.session.commit()
+        return [amenity.id for amenity in amenities]
+
+
+def auth_headers(app, user_id, **options):
+    with app.app_context():
+        token = create_access_token(identity=str(user_id), **options)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def headers(app, user):
+    return auth_headers(app, user)
@@ -0,0 +1,27 @@
+from urllib.parse import parse_qs, urlparse
+
+
+def test_pages_follow_the_next_cursor(client, amenities):
+    ids, url = [], "/api/amenities?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids += [amenity["id"] for amenity in response.get_json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        url = cursor and f"/api/amenities?limit=2&after={cursor}"
+    assert ids == amenities
+
+
+def test_next_link_keeps_the_query(client, amenities):
+    response = client.get("/api/amenities?limit=2&q=a b")
+    link = response.headers["Link"]
+    assert link.endswith('>; rel="next"')
+    query = parse_qs(urlparse(link[1 : link.index(">")]).query)
+    assert query == {"limit": ["2"], "q": ["a b"], "after": [str(amenities[1])]}
+
+
+def test_last_page_has_no_next_cursor(client, amenities):
+    response = client.get(f"/api/amenities?after={amenities[2]}")
+    assert [amenity["id"] for amenity in response.get_json()] == amenities[3:]
+    assert "X-Next-Cursor" not in response.headers
+    assert "Link" not in response.headers
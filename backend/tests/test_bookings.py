@@ -0,0 +1,59 @@
+import pytest
+
+from exts import db
+from models import Booking
+
+
+@pytest.fixture
+def book(client, amenities, headers):
+    def book(start, end, amenity_id=None):
+        return client.post(
+            "/api/booking",
+            json={
+                "amenity_id": amenity_id or amenities[0],
+                "start_date": f"2030-01-01T{start}",
+                "end_date": f"2030-01-01T{end}",
+            },
+            headers=headers,
+        )
+
+    return book
+
+
+def booking_ids(app):
+    with app.app_context():
+        return db.session.scalars(db.select(Booking.id).order_by(Booking.id)).all()
+
+
+def test_overlapping_bookings_are_rejected(book):
+    assert book("10:00", "11:00").status_code == 201
+    response = book("10:30", "11:30")
+    assert response.status_code == 409
+    assert response.get_json()["message"] == "Amenity is booked. Try another time"
+
+
+def test_adjacent_and_other_amenity_bookings_are_accepted(book, amenities):
+    assert book("10:00", "11:00").status_code == 201
+    assert book("11:00", "12:00").status_code == 201
+    assert book("10:00", "11:00", amenity_id=amenities[1]).status_code == 201
+
+
+def test_moving_onto_another_booking_is_rejected(app, client, book, headers):
+    book("10:00", "11:00")
+    book("12:00", "13:00")
+    first, second = booking_ids(app)
+
+    response = client.put(
+        f"/api/booking/{second}",
+        json={"start_date": "2030-01-01T10:30:00", "end_date": "2030-01-01T12:30:00"},
+        headers=headers,
+    )
+    assert response.status_code == 409
+
+    # A booking does not conflict with its own period
+    response = client.put(
+        f"/api/booking/{first}",
+        json={"start_date": "2030-01-01T10:30:00", "end_date": "2030-01-01T11:30:00"},
+        headers=headers,
+    )
+    assert response.status_code == 200
@@ -0,0 +1,34 @@
+def test_unchanged_categories_are_not_modified(client, amenities):
+    response = client.get("/api/amenities/categories")
+    assert response.status_code == 200
+    tag = response.headers["ETag"]
+
+    response = client.get("/api/amenities/categories", headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+
+
+def test_a_new_category_changes_the_tag(client, amenities):
+    tag = client.get("/api/amenities/categories").headers["ETag"]
+    client.post("/api/amenities/categories", json={"name": "hall"})
+
+    response = client.get("/api/amenities/categories", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    assert [category["name"] for category in response.get_json()] == ["pool", "hall"]
+
+
+def test_bookings_leave_the_amenity_tag(client, amenities, headers):
+    url = f"/api/amenities/{amenities[0]}"
+    tag = client.get(url).headers["ETag"]
+    response = client.post(
+        "/api/booking",
+        json={
+            "amenity_id": amenities[0],
+            "start_date": "2030-01-01T10:00:00",
+            "end_date": "2030-01-01T11:00:00",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 201
+    assert client.get(url, headers={"If-None-Match": tag}).status_code == 304
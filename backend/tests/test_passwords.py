@@ -0,0 +1,49 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from endpoints.passwords import HasherBusy, PasswordHasher
+from exts import db
+from models import User
+
+# Another method than the configured one, so logins rehash it
+OLD_HASH = generate_password_hash("secret", "pbkdf2:sha256:500")
+
+
+@pytest.fixture
+def old_hash(app, user):
+    with app.app_context():
+        db.session.get(User, user).password = OLD_HASH
+        db.session.commit()
+
+
+def stored_hash(app, user):
+    with app.app_context():
+        return db.session.get(User, user).password
+
+
+def login(client, password="secret"):
+    return client.post(
+        "/api/auth/login", json={"username": "test", "password": password}
+    )
+
+
+def test_login_rehashes_with_the_configured_method(app, client, user, old_hash):
+    assert login(client).status_code == 201
+    assert stored_hash(app, user).startswith("pbkdf2:sha256:1000$")
+
+
+def test_login_succeeds_when_the_rehash_times_out(
+    app, client, user, old_hash, monkeypatch
+):
+    def busy(self, password):
+        raise HasherBusy()
+
+    monkeypatch.setattr(PasswordHasher, "hash", busy)
+    response = login(client)
+    assert response.status_code == 201
+    assert "access_token" in response.get_json()
+    assert stored_hash(app, user) == OLD_HASH
+
+
+def test_wrong_password_is_rejected(client, old_hash):
+    assert login(client, "wrong").status_code == 404
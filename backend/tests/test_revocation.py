@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from conftest import auth_headers
+
+
+def test_logged_out_token_is_rejected(client, headers):
+    assert client.get("/api/auth/user", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout", headers=headers).status_code == 201
+
+    response = client.get("/api/auth/user", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Token has been revoked"
+
+
+def test_other_tokens_stay_valid_after_logout(app, client, user, headers):
+    other = auth_headers(app, user)
+    client.post("/api/auth/logout", headers=headers)
+    assert client.get("/api/auth/user", headers=other).status_code == 200
+
+
+def test_missing_token_is_rejected(client):
+    response = client.get("/api/auth/user")
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Missing Authorization Header"
+
+
+def test_expired_token_is_rejected(app, client, user):
+    headers = auth_headers(app, user, expires_delta=timedelta(seconds=-1))
+    response = client.get("/api/auth/user", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Token has expired"
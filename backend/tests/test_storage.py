@@ -0,0 +1,91 @@
+import hashlib
+import io
+import os
+from urllib.parse import urlparse
+
+import pytest
+
+from endpoints.storage import LocalStorage, S3Storage
+
+DATA = b"\x89PNG media content"
+NAME = hashlib.sha256(DATA).hexdigest()[:32] + ".png"
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path / "media"))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(key, "testing")
+    with moto.mock_aws():
+        storage = S3Storage("media", prefix="uploads", region="us-east-1")
+        storage.client.create_bucket(Bucket="media")
+        yield storage
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request):
+    return request.getfixturevalue(request.param)
+
+
+def test_put_and_read(storage):
+    assert storage.read_bytes("images", "a.png") is None
+    assert not storage.exists("images", "a.png")
+
+    storage.put_bytes("images", "a.png", DATA)
+    assert storage.exists("images", "a.png")
+    assert storage.read_bytes("images", "a.png") == DATA
+
+
+def test_save_stream_names_by_content(storage):
+    assert storage.save_stream("images", io.BytesIO(DATA), "png") == NAME
+    assert storage.save_stream("images", io.BytesIO(DATA), "png") == NAME
+    assert storage.read_bytes("images", NAME) == DATA
+
+
+def test_names_stay_in_their_folder(storage):
+    storage.put_bytes("images", "../../a.png", DATA)
+    assert storage.read_bytes("images", "a.png") == DATA
+
+
+def test_put_file_moves_it(storage, tmp_path):
+    src = tmp_path / "variant.png"
+    src.write_bytes(DATA)
+    storage.put_file("images", "b.png", str(src))
+    assert not src.exists()
+    assert storage.read_bytes("images", "b.png") == DATA
+
+
+def test_local_copy(storage):
+    storage.put_bytes("images", "a.png", DATA)
+    with storage.local_copy("images", "a.png") as path:
+        with open(path, "rb") as f:
+            assert f.read() == DATA
+
+
+def test_delete(storage):
+    storage.put_bytes("images", "a.png", DATA)
+    assert storage.delete("images", "a.png")
+    assert not storage.exists("images", "a.png")
+
+
+def test_local_files_are_served_by_the_app(local):
+    local.put_bytes("images", "a.png", DATA)
+    assert local.url("images", "a.png") is None
+    assert os.path.isfile(local.path("images", "a.png"))
+
+
+def test_s3_presigned_url(s3):
+    url = urlparse(s3.url("images", "a.png"))
+    assert url.path.endswith("/uploads/images/a.png")
+    assert "Signature" in url.query or "X-Amz-Signature" in url.query
+
+
+def test_s3_public_url(s3):
+    s3.public_url = "https://cdn.example.com"
+    assert s3.url("images", "a.png") == "https://cdn.example.com/uploads/images/a.png"
@@ -0,0 +1,20 @@
+def test_deleted_user_token_is_rejected(client, headers):
+    # Loads the user into the cache before it is deleted
+    assert client.get("/api/auth/user", headers=headers).status_code == 200
+    assert client.delete("/api/auth/user", headers=headers).status_code == 200
+
+    response = client.get("/api/auth/user", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Error loading the user 1"
+    response = client.put("/api/auth/user", data={"firstname": "x"}, headers=headers)
+    assert response.status_code == 401
+
+
+def test_updated_user_is_reloaded(client, headers):
+    profile = client.get("/api/auth/user", headers=headers).get_json()
+    assert profile["firstname"] == "Test"
+
+    response = client.put("/api/auth/user", data={"firstname": "New"}, headers=headers)
+    assert response.status_code == 200
+    profile = client.get("/api/auth/user", headers=headers).get_json()
+    assert profile["firstname"] == "New"
@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Edit, Plus, Trash2 } from 'lucide-react';
+import fetchAllPages from '../fetchAllPages';
 
 const apiUrl = import.meta.env.VITE_API_BASE_URL;
 
@@ -31,8 +32,7 @@ const Amenities = () => {
 
   const fetchAmenities = async () => {
     try {
-      const response = await axios.get(`${apiUrl}/api/amenities`);
-      setAmenities(response.data);
+      setAmenities(await fetchAllPages(`${apiUrl}/api/amenities`));
     } catch (error) {
       console.error('Error fetching amenities:', error);
     }
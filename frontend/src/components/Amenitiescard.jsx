@@ -1,22 +1,14 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
-import axios from 'axios';
+import fetchAllPages from '../fetchAllPages';
 
 const Amenitiescard = () => {
   const apiUrl = import.meta.env.VITE_API_BASE_URL;
   const [amenities, setAmenities] = useState([]);
 
   useEffect(() => {
-    axios
-      .get(`${apiUrl}/api/amenities`)
-      .then((response) => {
-        // Ensure response data is valid
-        if (Array.isArray(response.data)) {
-          setAmenities(response.data);
-        } else {
-          console.error('Unexpected API response format:', response.data);
-        }
-      })
+    fetchAllPages(`${apiUrl}/api/amenities`)
+      .then(setAmenities)
       .catch((error) => console.error('Error fetching amenities:', error));
   }, [apiUrl]);
 
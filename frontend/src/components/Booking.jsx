@@ -199,7 +199,7 @@ const Booking = () => {
               </p>
               {booking.qr_code && (
                 <img
-                  src={`${apiUrl}/api/bookings_qr/${booking.qr_code}`}
+                  src={`${apiUrl}/api/booking/qr/${booking.qr_code}.svg`}
                   alt="Booking QR Code"
                   className="mt-2 w-48 h-48"
                 />
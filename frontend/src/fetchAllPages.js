@@ -0,0 +1,19 @@
+import axios from 'axios';
+
+// Follows the X-Next-Cursor header of keyset paginated list endpoints and
+// returns the rows of every page.
+const fetchAllPages = async (url, config = {}) => {
+  const rows = [];
+  let after;
+  do {
+    const response = await axios.get(url, {
+      ...config,
+      params: { ...config.params, ...(after ? { after } : {}) }
+    });
+    rows.push(...response.data);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return rows;
+};
+
+export default fetchAllPages;